@@ -0,0 +1,219 @@
+"""
+Upstream admission control for the Portfolio API.
+
+Every non-preset /api/chat turn races ~10 upstream requests, so a burst of
+visitors multiplies into hundreds of outbound calls that all slow each other
+down. The admission controller caps how many turns may race upstream at once:
+
+  - Up to `limit` turns run concurrently.
+  - Up to ADMISSION_QUEUE_SIZE more wait, each for at most ADMISSION_QUEUE_TIMEOUT
+    (less if the request's deadline runs out first).
+  - Anything beyond that is rejected immediately (503 + Retry-After).
+
+The limit adapts AIMD-style to observed upstream latency: +1/limit per fast,
+successful turn; ×ADMISSION_DECREASE_FACTOR when a turn is slow or fails
+(at most once per cooldown, so one slow burst only backs off once).
+
+Zero external dependencies — state is per-process, like the rate limiter.
+"""
+
+import os
+import math
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+from api.deadlines import Deadline
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Configuration
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+ADMISSION_INITIAL_LIMIT = int(os.getenv("ADMISSION_INITIAL_LIMIT", "8"))
+ADMISSION_MIN_LIMIT = int(os.getenv("ADMISSION_MIN_LIMIT", "2"))
+ADMISSION_MAX_LIMIT = int(os.getenv("ADMISSION_MAX_LIMIT", "32"))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "16"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2.0"))   # seconds
+ADMISSION_LATENCY_TARGET = float(os.getenv("ADMISSION_LATENCY_TARGET", "6.0"))  # seconds
+ADMISSION_DECREASE_FACTOR = 0.75
+ADMISSION_EWMA_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """Raised when the controller is saturated; carries a Retry-After hint (seconds)."""
+
+    def __init__(self, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _Slot:
+    """Handle for an admitted turn. Call `failed()` if the upstream race failed."""
+
+    __slots__ = ("ok",)
+
+    def __init__(self):
+        self.ok = True
+
+    def failed(self):
+        self.ok = False
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# AIMD Admission Controller
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+class AdmissionController:
+    """
+    Concurrency limiter with a bounded FIFO wait queue and an adaptive limit.
+
+    Runs entirely on the event loop thread, so no locks are needed.
+
+    Usage:
+        async with admission_controller.admit() as slot:
+            result = await get_chat_response(messages)
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = ADMISSION_INITIAL_LIMIT,
+        min_limit: int = ADMISSION_MIN_LIMIT,
+        max_limit: int = ADMISSION_MAX_LIMIT,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        latency_target: float = ADMISSION_LATENCY_TARGET,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.latency_target = latency_target
+
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._latency_ewma: float | None = None
+        self._last_decrease = 0.0
+
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait — roughly one upstream turn."""
+        estimate = self._latency_ewma or self.queue_timeout
+        return max(1, math.ceil(estimate))
+
+    # ── Acquire / release ───────────────────────────────────────────────────
+
+    async def _acquire(self, deadline: Deadline | None = None):
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            self._admitted += 1
+            return
+
+        if len(self._waiters) >= self.queue_size:
+            self._rejected += 1
+            raise AdmissionRejected(self.retry_after(), "queue full")
+
+        # A request never queues past the point where its deadline leaves no time to race
+        timeout, reason = self.queue_timeout, "queue timeout"
+        if deadline is not None and deadline.remaining_for_upstream() < timeout:
+            timeout, reason = deadline.remaining_for_upstream(), "deadline"
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                # Slot was handed over just as the timeout fired — keep it
+                self._admitted += 1
+                return
+            self._discard_waiter(fut)
+            self._timed_out += 1
+            raise AdmissionRejected(self.retry_after(), reason)
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Client went away after being admitted — give the slot back
+                self._in_flight -= 1
+                self._wake_waiters()
+            else:
+                self._discard_waiter(fut)
+            raise
+        self._admitted += 1
+
+    def _discard_waiter(self, fut: asyncio.Future):
+        try:
+            self._waiters.remove(fut)
+        except ValueError:
+            pass
+
+    def _wake_waiters(self):
+        while self._waiters and self._in_flight < self.limit:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self._in_flight += 1
+                fut.set_result(None)
+
+    def _release(self, latency: float, ok: bool):
+        self._observe(latency, ok)
+        self._in_flight -= 1
+        self._wake_waiters()
+
+    def _observe(self, latency: float, ok: bool):
+        """AIMD update from one completed turn."""
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+        else:
+            self._latency_ewma += ADMISSION_EWMA_ALPHA * (latency - self._latency_ewma)
+
+        now = time.monotonic()
+        if not ok or latency > self.latency_target:
+            # Multiplicative decrease, at most once per target-latency window
+            if now - self._last_decrease >= self.latency_target:
+                self._limit = max(self.min_limit, self._limit * ADMISSION_DECREASE_FACTOR)
+                self._last_decrease = now
+        else:
+            # Additive increase: roughly +1 per `limit` successful turns
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+    @asynccontextmanager
+    async def admit(self, deadline: Deadline | None = None):
+        """
+        Hold an upstream slot for the duration of the block. With a `deadline`,
+        queueing gives up once only the fallback reserve is left.
+        """
+        await self._acquire(deadline)
+        slot = _Slot()
+        started = time.monotonic()
+        try:
+            yield slot
+        except BaseException:
+            slot.ok = False
+            raise
+        finally:
+            self._release(time.monotonic() - started, slot.ok)
+
+    def get_stats(self) -> dict:
+        """Return current admission stats (for health check)."""
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "queued": len(self._waiters),
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "queue_timeouts": self._timed_out,
+            "latency_ewma_s": round(self._latency_ewma, 2) if self._latency_ewma else None,
+        }
+
+
+# Singleton instance
+admission_controller = AdmissionController()
@@ -0,0 +1,353 @@
+"""
+Compact storage for chat_messages.content.
+
+The same preset replies (CATEGORY_RESPONSES, the Layer 2 sanitized reply, the
+"trouble connecting" error) used to be written in full on every blocked turn,
+and long replies/pastes were stored as plain text. In compact mode (SQLite
+only, COMPACT_STORAGE=1) a value is stored as one of:
+
+  - TEXT              plain content — short values and every pre-existing row
+  - BLOB b"R" + key   reference to a shared row in chat_contents, for texts
+                      registered by the profiles (content-addressed by SHA-256)
+  - BLOB b"Z" + frame zstd frame, compressed with the latest trained dictionary
+                      from chat_dictionaries (the frame records which one)
+
+CompactText decodes on every read path (ORM, Core selects, export, retention
+archives), so callers always see the original string. Decoding is always on,
+so compact rows stay readable after the mode is switched off. Without the
+optional `zstandard` package, shared references still work and nothing is
+compressed.
+
+Train a dictionary and convert existing rows with `scripts/compact_storage.py`.
+"""
+
+import os
+import hashlib
+import threading
+
+from sqlalchemy import Text, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.types import TypeDecorator
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover — optional, compression is skipped
+    zstandard = None
+
+
+COMPACT_STORAGE = os.getenv("COMPACT_STORAGE", "0") == "1"
+COMPACT_MIN_CHARS = int(os.getenv("COMPACT_MIN_CHARS", "200"))   # shorter values stay TEXT
+COMPACT_LEVEL = int(os.getenv("COMPACT_LEVEL", "6"))
+DICTIONARY_SIZE = 16 * 1024
+DICTIONARY_SAMPLE_LIMIT = 20000
+
+_REF = b"R"
+_ZSTD = b"Z"
+
+
+def content_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+class ContentStore:
+    """
+    In-process view of the shared texts and compression dictionaries.
+
+    Shared texts are immutable (keyed by hash) and dictionaries are never
+    rewritten, so both are cached forever once seen. Compressors are not
+    thread-safe, so each thread keeps its own.
+    """
+
+    def __init__(self, enabled: bool = COMPACT_STORAGE):
+        self.enabled = enabled
+        self._shared: dict[str, str] = {}      # key → text, persisted in chat_contents
+        self._pending: dict[str, str] = {}     # registered, not yet persisted
+        self._dicts: dict[int, bytes] = {}     # zstd dict_id → raw dictionary
+        self._active_dict_id = 0               # 0 = compress without a dictionary
+        self._engine = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # ── Shared contents ───────────────────────────────────────────────────────
+
+    def register_shared(self, texts):
+        """Mark texts (preset / sanitized / error replies) for storage by reference."""
+        with self._lock:
+            for text in texts:
+                if text:
+                    key = content_key(text)
+                    if key not in self._shared:
+                        self._pending[key] = text
+        if self._engine is not None:
+            self._persist_pending()
+
+    def _persist_pending(self):
+        from api.database import SharedContent
+
+        with self._lock:
+            pending = dict(self._pending)
+        if not pending:
+            return
+        table = SharedContent.__table__
+        with self._engine.connect() as conn:
+            existing = set(conn.execute(
+                select(table.c.id).where(table.c.id.in_(list(pending)))
+            ).scalars())
+        for key, text in pending.items():
+            if key in existing:
+                continue
+            try:
+                with self._engine.begin() as conn:
+                    conn.execute(table.insert().values(id=key, content=text))
+            except IntegrityError:
+                pass  # another worker inserted the same text first
+        with self._lock:
+            for key, text in pending.items():
+                self._shared[key] = text
+                self._pending.pop(key, None)
+
+    def sync(self, engine):
+        """Called once the tables exist: persist registered texts, load the latest dictionary."""
+        from api.database import CompressionDictionary
+
+        self._engine = engine
+        self._persist_pending()
+        table = CompressionDictionary.__table__
+        with engine.connect() as conn:
+            row = conn.execute(
+                select(table.c.id, table.c.data).order_by(table.c.id.desc()).limit(1)
+            ).first()
+        if row is not None:
+            self._dicts[row.id] = row.data
+            self._active_dict_id = row.id
+
+    def _load_shared(self, key: str) -> str:
+        from api.database import SharedContent, get_engine
+
+        table = SharedContent.__table__
+        with get_engine().connect() as conn:
+            text = conn.execute(select(table.c.content).where(table.c.id == key)).scalar()
+        if text is None:
+            raise LookupError(f"chat_contents row {key} is missing")
+        self._shared[key] = text
+        return text
+
+    # ── zstd ──────────────────────────────────────────────────────────────────
+
+    def _dictionary(self, dict_id: int) -> bytes:
+        data = self._dicts.get(dict_id)
+        if data is None:
+            from api.database import CompressionDictionary, get_engine
+
+            table = CompressionDictionary.__table__
+            with get_engine().connect() as conn:
+                data = conn.execute(select(table.c.data).where(table.c.id == dict_id)).scalar()
+            if data is None:
+                raise LookupError(f"chat_dictionaries row {dict_id} is missing")
+            self._dicts[dict_id] = data
+        return data
+
+    def _compressor(self):
+        dict_id = self._active_dict_id
+        cache = self._local.__dict__.setdefault("compressors", {})
+        compressor = cache.get(dict_id)
+        if compressor is None:
+            dict_data = zstandard.ZstdCompressionDict(self._dicts[dict_id]) if dict_id else None
+            compressor = cache[dict_id] = zstandard.ZstdCompressor(
+                level=COMPACT_LEVEL,
+                dict_data=dict_data,
+                write_content_size=True,
+                write_checksum=False,
+                write_dict_id=True,
+            )
+        return compressor
+
+    def _decompressor(self, dict_id: int):
+        cache = self._local.__dict__.setdefault("decompressors", {})
+        decompressor = cache.get(dict_id)
+        if decompressor is None:
+            dict_data = zstandard.ZstdCompressionDict(self._dictionary(dict_id)) if dict_id else None
+            decompressor = cache[dict_id] = zstandard.ZstdDecompressor(dict_data=dict_data)
+        return decompressor
+
+    def activate_dictionary(self, dict_id: int, data: bytes):
+        self._dicts[dict_id] = data
+        self._active_dict_id = dict_id
+
+    # ── Codec ─────────────────────────────────────────────────────────────────
+
+    def encode(self, text: str):
+        """Stored form of `text`: the text itself, or a tagged BLOB."""
+        key = content_key(text)
+        if key in self._shared:
+            return _REF + key.encode("ascii")
+        if zstandard is None or len(text) < COMPACT_MIN_CHARS:
+            return text
+        raw = text.encode("utf-8")
+        frame = self._compressor().compress(raw)
+        if len(frame) + 1 >= len(raw):
+            return text  # not worth it (already dense / very short)
+        return _ZSTD + frame
+
+    def decode(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        value = bytes(value)
+        tag, body = value[:1], value[1:]
+        if tag == _REF:
+            key = body.decode("ascii")
+            return self._shared.get(key) or self._load_shared(key)
+        if tag == _ZSTD:
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read compressed chat content")
+            dict_id = zstandard.get_frame_parameters(body).dict_id
+            return self._decompressor(dict_id).decompress(body).decode("utf-8")
+        raise ValueError(f"Unknown stored content tag {tag!r}")
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "shared_texts": len(self._shared),
+            "dictionary_id": self._active_dict_id or None,
+            "zstd": zstandard is not None,
+        }
+
+
+# Singleton instance
+content_store = ContentStore()
+
+
+class CompactText(TypeDecorator):
+    """
+    Text column that is transparently encoded by content_store.
+
+    Encoding only happens on SQLite in compact mode: SQLite keeps BLOB values
+    in a TEXT column as-is, other databases would reject them.
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not content_store.enabled or dialect.name != "sqlite":
+            return value
+        return content_store.encode(value)
+
+    def process_result_value(self, value, dialect):
+        return content_store.decode(value)
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Dictionary training
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+def train_dictionary(
+    size: int = DICTIONARY_SIZE,
+    sample_limit: int = DICTIONARY_SAMPLE_LIMIT,
+) -> dict:
+    """
+    Train a zstd dictionary on the newest long messages and make it the active one.
+
+    Returns {"dictionary_id", "samples", "bytes"}. Older dictionaries are kept:
+    rows compressed with them still name them in their frame header.
+    """
+    from api.database import ChatMessage, CompressionDictionary, get_engine, init_db
+
+    if zstandard is None:
+        raise RuntimeError("zstandard is not installed")
+    init_db()
+    engine = get_engine()
+    messages = ChatMessage.__table__
+    dictionaries = CompressionDictionary.__table__
+
+    with engine.connect() as conn:
+        samples = [
+            text.encode("utf-8")
+            for text in conn.execute(
+                select(messages.c.content).order_by(messages.c.created_at.desc()).limit(sample_limit)
+            ).scalars()
+            if len(text) >= COMPACT_MIN_CHARS and content_key(text) not in content_store._shared
+        ]
+        if len(samples) < 100:
+            raise ValueError(f"Need at least 100 long messages to train a dictionary, found {len(samples)}")
+        next_id = (conn.execute(select(dictionaries.c.id).order_by(dictionaries.c.id.desc())).scalar() or 0) + 1
+
+    trained = zstandard.train_dictionary(size, samples, dict_id=next_id, level=COMPACT_LEVEL)
+    data = trained.as_bytes()
+    with engine.begin() as conn:
+        conn.execute(dictionaries.insert().values(id=next_id, data=data, samples=len(samples)))
+    content_store.activate_dictionary(next_id, data)
+    return {"dictionary_id": next_id, "samples": len(samples), "bytes": len(data)}
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Online conversion
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+CONVERT_BATCH_SIZE = 500
+CONVERT_BATCH_PAUSE = 0.05  # seconds between batches
+
+
+def convert_messages(
+    compact: bool = True,
+    recompress: bool = False,
+    batch_size: int = CONVERT_BATCH_SIZE,
+    pause: float = CONVERT_BATCH_PAUSE,
+) -> dict:
+    """
+    Rewrite stored content in place, in small id-ordered batches.
+
+    compact=True encodes plain rows (and, with `recompress`, re-encodes BLOB
+    rows with the active dictionary); compact=False expands every row back to
+    plain TEXT. Switches this process's content_store into the chosen mode.
+
+    Returns {"rows_scanned", "rows_rewritten", "duration_s"}.
+    """
+    import time
+
+    from sqlalchemy import func, update
+
+    from api.database import ChatMessage, get_engine, init_db
+
+    started = time.perf_counter()
+    init_db()
+    engine = get_engine()
+    if engine.dialect.name != "sqlite":
+        return {"rows_scanned": 0, "rows_rewritten": 0, "skipped": "not sqlite"}
+    content_store.enabled = compact
+
+    table = ChatMessage.__table__
+    stored_type = func.typeof(table.c.content)
+    if not compact:
+        wanted = stored_type == "blob"
+    elif recompress:
+        wanted = stored_type.in_(["text", "blob"])
+    else:
+        wanted = stored_type == "text"
+
+    scanned, rewritten, last_id = 0, 0, ""
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.content, stored_type.label("stored"))
+                .where(table.c.id > last_id, wanted)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            for row in rows:
+                stays_text = not compact or isinstance(content_store.encode(row.content), str)
+                if stays_text and row.stored == "text":
+                    continue
+                conn.execute(update(table).where(table.c.id == row.id).values(content=row.content))
+                rewritten += 1
+        scanned += len(rows)
+        last_id = rows[-1].id
+        time.sleep(pause)
+
+    return {
+        "rows_scanned": scanned,
+        "rows_rewritten": rewritten,
+        "duration_s": round(time.perf_counter() - started, 2),
+    }
@@ -0,0 +1,104 @@
+"""
+Recent-context cache for chat turns.
+
+Each chat turn needs the session's last HISTORY_CONTEXT_LIMIT messages before
+the upstream race can start. Reading them from the DB put a query on the
+critical path of every turn; this cache keeps the tail of each active session
+in memory, so follow-up turns start racing immediately.
+
+Entries are written through by the chat turn itself (every message it
+persists is appended). Another worker process may serve the same session, so
+a cached tail is never trusted for long:
+
+  - it expires CONTEXT_CACHE_TTL seconds after it was read from the DB,
+    however often it is extended;
+  - each entry remembers the created_at of its newest message, and a turn
+    served from the cache checks the DB's newest message alongside the
+    race — if another process wrote after it, the entry is dropped and the
+    next turn re-reads.
+
+Bounded (LRU past CONTEXT_CACHE_MAX_SESSIONS) and per-process, like the
+idempotency store.
+"""
+
+import os
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+
+CONTEXT_CACHE_TTL = float(os.getenv("CONTEXT_CACHE_TTL", "60"))            # seconds since the DB read
+CONTEXT_CACHE_MAX_SESSIONS = int(os.getenv("CONTEXT_CACHE_MAX_SESSIONS", "5000"))
+
+
+class ContextCache:
+    """
+    Maps session_id → (expires_at, deque of {"role", "content"}, newest created_at).
+
+    Runs on the event loop thread only, so no locks are needed.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        ttl: float = CONTEXT_CACHE_TTL,
+        max_sessions: int = CONTEXT_CACHE_MAX_SESSIONS,
+    ):
+        self.limit = limit
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._entries: OrderedDict[str, tuple[float, deque, datetime]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, session_id: str) -> list[dict] | None:
+        """The cached tail (oldest first), or None on a miss."""
+        entry = self._entries.get(session_id)
+        if entry is None or entry[0] <= time.monotonic():
+            self._entries.pop(session_id, None)
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._entries.move_to_end(session_id)
+        return list(entry[1])
+
+    def newest_at(self, session_id: str) -> datetime | None:
+        """created_at of the newest cached message, or None if not cached."""
+        entry = self._entries.get(session_id)
+        return entry[2] if entry is not None else None
+
+    def put(self, session_id: str, messages: list[dict], newest_at: datetime):
+        """Replace a session's tail (e.g. after reading it from the DB)."""
+        self._entries[session_id] = (
+            time.monotonic() + self.ttl,
+            deque(messages[-self.limit:], maxlen=self.limit),
+            newest_at,
+        )
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
+
+    def extend(self, session_id: str, messages: list[dict], newest_at: datetime):
+        """
+        Append to a cached session, keeping its expiry; a session that isn't
+        cached is left for the next read.
+        """
+        entry = self._entries.get(session_id)
+        if entry is not None:
+            entry[1].extend(messages)
+            self._entries[session_id] = (entry[0], entry[1], newest_at)
+
+    def invalidate(self, session_id: str):
+        """Drop a session whose DB history moved on without this process."""
+        if self._entries.pop(session_id, None) is not None:
+            self._invalidations += 1
+
+    def get_stats(self) -> dict:
+        """Return current cache stats (for health check)."""
+        return {
+            "sessions": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "invalidations": self._invalidations,
+        }
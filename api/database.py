@@ -3,17 +3,20 @@ Database setup and models for the chat history.
 Uses SQLAlchemy with SQLite (easily swappable to PostgreSQL).
 """
 
+import os
+import time
 import uuid
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, String, Text, DateTime, create_engine
+from sqlalchemy import Column, String, Text, DateTime, Integer, LargeBinary, Index, create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-from pathlib import Path
-from dotenv import load_dotenv
-import os
+from api.settings import load_env, LAZY_INIT
+from api.content_store import CompactText, content_store
 
-load_dotenv(Path(__file__).parent / ".env")
+load_env()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./chat.db")
 
@@ -23,33 +26,145 @@ if os.getenv("VERCEL") and DATABASE_URL.startswith("sqlite:///./"):
 
 # For SQLite, need check_same_thread=False
 connect_args = {"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
-engine = create_engine(DATABASE_URL, connect_args=connect_args, echo=False)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The engine is built on first use (see get_engine) so importing this module
+# stays cheap on serverless cold starts. SessionLocal is bound at that point.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 Base = declarative_base()
 
+_engine = None
+_tables_ready = False
+_init_lock = threading.Lock()
+
+
+_uuid7_lock = threading.Lock()
+_uuid7_last_ms = 0
+_uuid7_seq = 0
+
+
+def uuid7(timestamp_ms: int | None = None) -> str:
+    """
+    Time-ordered UUID (RFC 9562 version 7) as a string.
+
+    The leading 48 bits are the Unix timestamp in milliseconds and, for keys
+    generated "now", the next 12 bits are a per-millisecond counter. New keys
+    therefore always land at the right edge of the primary-key B-tree instead
+    of random pages — inserts stay append-like and index pages stay full.
+    """
+    global _uuid7_last_ms, _uuid7_seq
+    rand = int.from_bytes(os.urandom(10), "big")
+    if timestamp_ms is None:
+        with _uuid7_lock:
+            timestamp_ms = max(time.time_ns() // 1_000_000, _uuid7_last_ms)
+            if timestamp_ms == _uuid7_last_ms:
+                _uuid7_seq += 1
+                if _uuid7_seq > 0xFFF:
+                    # Counter exhausted — borrow the next millisecond
+                    timestamp_ms += 1
+                    _uuid7_seq = 0
+            else:
+                _uuid7_seq = (rand >> 62) & 0x7FF  # random start, leaves headroom
+            _uuid7_last_ms = timestamp_ms
+            rand_a = _uuid7_seq
+    else:
+        rand_a = (rand >> 62) & 0xFFF
+    value = (
+        (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76                         # version
+        | rand_a << 64                      # counter / rand_a
+        | 0b10 << 62                        # variant
+        | (rand & ((1 << 62) - 1))          # rand_b
+    )
+    return str(uuid.UUID(int=value))
+
 
 class ChatMessage(Base):
     """Stores every chat message (user and assistant) with session tracking."""
     __tablename__ = "chat_messages"
 
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String, primary_key=True, default=lambda: uuid7())
     session_id = Column(String, index=True, nullable=False)
     role = Column(String, nullable=False)  # 'user' or 'assistant'
-    content = Column(Text, nullable=False)
+    content = Column(CompactText, nullable=False)  # plain, shared reference or zstd (content_store)
     model_used = Column(String, nullable=True)  # which OpenRouter model responded
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        # A session's messages in order: context reads, history, and the
+        # per-row "next reply" lookup in retention
+        Index("ix_chat_messages_session_created", "session_id", "created_at"),
+    )
+
+
+class SharedContent(Base):
+    """Preset / sanitized / error reply texts that compact rows reference by hash."""
+    __tablename__ = "chat_contents"
+
+    id = Column(String, primary_key=True)  # content_key(content)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class CompressionDictionary(Base):
+    """Trained zstd dictionaries; `id` is the dictionary ID written into each frame."""
+    __tablename__ = "chat_dictionaries"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    data = Column(LargeBinary, nullable=False)
+    samples = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+def _sqlite_on_connect(dbapi_conn, _record):
+    # Only takes effect on a fresh file (before the first table is created);
+    # lets the retention job hand freed pages back with incremental_vacuum.
+    dbapi_conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+
+def get_engine():
+    """Return the shared engine, creating it (and binding SessionLocal) on first call."""
+    global _engine
+    if _engine is None:
+        with _init_lock:
+            if _engine is None:
+                _engine = create_engine(DATABASE_URL, connect_args=connect_args, echo=False)
+                if _engine.dialect.name == "sqlite":
+                    event.listen(_engine, "connect", _sqlite_on_connect)
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
 
 def init_db():
-    """Create all tables if they don't exist."""
-    Base.metadata.create_all(bind=engine)
+    """Create all tables if they don't exist. Safe to call repeatedly."""
+    global _tables_ready
+    if _tables_ready:
+        return
+    engine = get_engine()
+    with _init_lock:
+        if not _tables_ready:
+            Base.metadata.create_all(bind=engine)
+            # create_all skips indexes on tables that already exist
+            for index in ChatMessage.__table__.indexes:
+                index.create(bind=engine, checkfirst=True)
+            content_store.sync(engine)
+            _tables_ready = True
 
 
 def get_db():
     """Dependency for FastAPI — yields a DB session."""
+    # In lazy mode tables are created on the first request that touches the DB
+    if LAZY_INIT:
+        init_db()
+    else:
+        get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+@contextmanager
+def db_session():
+    """Context-manager form of get_db for code outside FastAPI's dependency injection."""
+    yield from get_db()
@@ -0,0 +1,171 @@
+"""
+End-to-end request deadlines with graceful fallback.
+
+Every chat turn gets one deadline when it arrives (DEADLINE_BUDGETS per
+endpoint; a client may ask for a different budget with the `X-Deadline-Ms`
+header / "deadline_ms" WebSocket field, clamped to DEADLINE_MIN_S–DEADLINE_MAX_S).
+The same Deadline is threaded through the turn:
+
+  - DB waits (context read, queued writes) give up when it runs out and the
+    turn carries on with what it has; the writes themselves still land.
+  - The model race gets whatever is left minus FALLBACK_RESERVE_S. When that
+    runs out, the remaining upstream tasks are cancelled and the turn answers
+    from the fallback chain instead of waiting for httpx's own timeout:
+        1. a cached answer to the same first question (answer_cache)
+        2. a local answer built from the profile's facts
+        3. the profile's error reply
+
+Misses and fallbacks are counted in deadline_stats (see /api/health).
+"""
+
+import os
+import re
+import time
+from collections import OrderedDict
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Configuration
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+DEADLINE_BUDGETS = {
+    # endpoint_key: default budget in seconds
+    "chat": float(os.getenv("DEADLINE_CHAT_S", "10")),
+    "ws": float(os.getenv("DEADLINE_WS_S", "10")),
+    "history": float(os.getenv("DEADLINE_HISTORY_S", "3")),
+}
+
+# Bounds on client-requested budgets
+DEADLINE_MIN_S = 1.0
+DEADLINE_MAX_S = float(os.getenv("DEADLINE_MAX_S", "20"))
+
+# Time kept back from the model race for fallback, validation and the response
+FALLBACK_RESERVE_S = 0.25
+
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+
+
+class DeadlineExceeded(Exception):
+    """The model race ran out of time; remaining upstream tasks were cancelled."""
+
+
+class Deadline:
+    """A point in time (monotonic clock) a request must be answered by."""
+
+    def __init__(self, budget_s: float):
+        self.budget_s = budget_s
+        self.expires_at = time.monotonic() + budget_s
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def remaining_for_upstream(self) -> float:
+        """What the model race may use, keeping FALLBACK_RESERVE_S for the fallback path."""
+        return max(self.remaining() - FALLBACK_RESERVE_S, 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+def request_deadline(endpoint: str, requested_ms=None) -> Deadline:
+    """
+    The deadline for a request to `endpoint`. A client-requested budget (in ms)
+    replaces the endpoint default, clamped to DEADLINE_MIN_S–DEADLINE_MAX_S;
+    malformed values are ignored.
+    """
+    budget = DEADLINE_BUDGETS[endpoint]
+    if requested_ms is not None:
+        try:
+            requested = float(requested_ms) / 1000
+        except (TypeError, ValueError):
+            requested = None
+        if requested is not None and requested == requested:  # not NaN
+            budget = min(max(requested, DEADLINE_MIN_S), DEADLINE_MAX_S)
+            deadline_stats.record("client_overrides")
+    return Deadline(budget)
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Stats
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+class DeadlineStats:
+    """Counters for deadline misses and how they were answered. Event loop thread only."""
+
+    def __init__(self):
+        self._counts = {
+            "turns": 0,
+            "client_overrides": 0,
+            "race_misses": 0,          # race cut off by the deadline
+            "context_timeouts": 0,     # context read abandoned, raced with the question only
+            "write_waits_abandoned": 0,
+            "history_timeouts": 0,
+            "late_responses": 0,       # answered after the deadline anyway
+            "fallback_cached": 0,
+            "fallback_facts": 0,
+            "fallback_error": 0,
+        }
+
+    def record(self, name: str):
+        self._counts[name] += 1
+
+    def get_stats(self) -> dict:
+        """Return deadline counters (for health check)."""
+        return {
+            "budgets_s": DEADLINE_BUDGETS,
+            **self._counts,
+        }
+
+
+# Singleton instance
+deadline_stats = DeadlineStats()
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Fallback answers
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", question.lower()).split())
+
+
+class AnswerCache:
+    """
+    Recent validated model answers, keyed by (profile, normalized question).
+
+    Only answers to a session's first question are stored: they did not
+    depend on earlier conversation, so they stand on their own when replayed
+    as a fallback. Bounded LRU with TTL, per-process. Event loop thread only.
+    """
+
+    def __init__(self, ttl: float = ANSWER_CACHE_TTL, max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], tuple[float, str]] = OrderedDict()
+
+    def get(self, profile_id: str, question: str) -> str | None:
+        key = (profile_id, normalize_question(question))
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, profile_id: str, question: str, answer: str):
+        key = (profile_id, normalize_question(question))
+        self._entries[key] = (time.monotonic() + self.ttl, answer)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# Singleton instance
+answer_cache = AnswerCache()
@@ -0,0 +1,167 @@
+"""
+Edge pre-filter for the Portfolio API.
+
+Rate limits used to be enforced by a FastAPI dependency, i.e. after routing,
+after the JSON body had been read and validated into ChatRequest, and next to
+get_db opening a session. A flood of requests that were going to be rejected
+anyway still paid for all of that.
+
+EdgeFilterMiddleware is a pure ASGI middleware that runs before routing:
+
+  - Rate limits (endpoint + global, same limiter and numbers as before) are
+    checked from the method, path and client IP alone.
+  - Request bodies are capped at EDGE_MAX_BODY_BYTES: an oversized
+    Content-Length is refused up front, a chunked body is cut off as soon as
+    it crosses the cap.
+  - 429 and 413 responses are pre-rendered bytes; only the retry_after /
+    limit numbers are spliced in.
+
+It sits inside CORSMiddleware so rejections still carry CORS headers and
+preflight requests are never counted.
+"""
+
+import os
+
+from fastapi.requests import HTTPConnection
+
+from api.rate_limiter import check_limits, get_client_ip
+
+
+# (method, path) → rate limit key; same coverage the per-route dependencies had
+EDGE_LIMITED_ROUTES = {
+    ("POST", "/api/chat"): "chat",
+    ("GET", "/api/chat/history"): "history",
+    ("GET", "/api/admin/export"): "export",
+}
+
+EDGE_MAX_BODY_BYTES = int(os.getenv("EDGE_MAX_BODY_BYTES", str(32 * 1024)))
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Pre-rendered responses
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+_JSON_HEADERS = [(b"content-type", b"application/json")]
+
+# Same body shape as the HTTPException the rate-limit dependency raised
+_TOO_MANY_PREFIX = b'{"detail":{"error":"Too many requests. Please slow down.","retry_after":'
+_TOO_MANY_MIDDLE = b',"limit":'
+_TOO_MANY_SUFFIX = b"}}"
+
+_TOO_LARGE_BODY = (
+    b'{"detail":{"error":"Request body too large.","max_bytes":'
+    + str(EDGE_MAX_BODY_BYTES).encode()
+    + b"}}"
+)
+_TOO_LARGE_START = {
+    "type": "http.response.start",
+    "status": 413,
+    "headers": _JSON_HEADERS + [
+        (b"content-length", str(len(_TOO_LARGE_BODY)).encode()),
+        (b"connection", b"close"),
+    ],
+}
+_TOO_LARGE_BODY_MESSAGE = {"type": "http.response.body", "body": _TOO_LARGE_BODY}
+
+
+async def _send_too_many(send, rejected: dict):
+    body = b"".join((
+        _TOO_MANY_PREFIX, str(rejected["retry_after"]).encode(),
+        _TOO_MANY_MIDDLE, str(rejected["limit"]).encode(),
+        _TOO_MANY_SUFFIX,
+    ))
+    await send({
+        "type": "http.response.start",
+        "status": 429,
+        "headers": _JSON_HEADERS + [
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(int(rejected["retry_after"])).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_too_large(send):
+    await send(_TOO_LARGE_START)
+    await send(_TOO_LARGE_BODY_MESSAGE)
+
+
+def _content_length(scope) -> int | None:
+    for name, value in scope["headers"]:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Middleware
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+class EdgeFilterMiddleware:
+    """
+    Pure ASGI middleware that rejects rate-limited and oversized requests
+    before they reach routing, body parsing or the database.
+
+    Usage (before CORSMiddleware, so CORS wraps it):
+        app.add_middleware(EdgeFilterMiddleware)
+    """
+
+    def __init__(self, app, max_body_bytes: int = EDGE_MAX_BODY_BYTES):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        content_length = _content_length(scope)
+        if content_length is not None and content_length > self.max_body_bytes:
+            await _send_too_large(send)
+            return
+
+        endpoint = EDGE_LIMITED_ROUTES.get((scope["method"], scope["path"]))
+        if endpoint is not None:
+            client_ip = get_client_ip(HTTPConnection(scope))
+            rejected = check_limits(client_ip, endpoint)
+            if rejected:
+                print(f"[RATE LIMIT] {client_ip} hit {rejected['scope']} limit — retry in {rejected['retry_after']}s")
+                await _send_too_many(send, rejected)
+                return
+
+        if content_length is not None:
+            # Declared size is within the cap; the server enforces it
+            await self.app(scope, receive, send)
+            return
+
+        await self._call_capped(scope, receive, send)
+
+    async def _call_capped(self, scope, receive, send):
+        """Stream a body of unknown length, answering 413 once it crosses the cap."""
+        received = 0
+        cut_off = False
+        response_started = False
+
+        async def capped_receive():
+            nonlocal received, cut_off
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes and not cut_off:
+                    cut_off = True
+                    if not response_started:
+                        await _send_too_large(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if cut_off:
+                return  # the 413 has already been sent
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        await self.app(scope, capped_receive, guarded_send)
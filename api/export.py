@@ -0,0 +1,122 @@
+"""
+Streaming NDJSON export of chat_messages.
+
+Rows are read in keyset-paginated pages ordered by (created_at, id): each page
+is a short, independent read, so memory stays flat regardless of table size
+and no long-lived transaction holds up the live chat endpoints.
+
+Filters:
+  - start / end:  created_at range (ISO 8601, inclusive start, exclusive end)
+  - model_used:   pattern with '*' wildcard ('none' = NULL-model assistant rows)
+  - category:     Layer 3 category, recomputed with classify_question; restricts
+                  the export to user messages (categories are not stored)
+
+Used by `python -m scripts.export_chats` and GET /api/admin/export.
+"""
+
+import json
+import zlib
+from datetime import datetime
+from typing import Iterator
+
+from sqlalchemy import and_, or_, select
+
+from api.database import ChatMessage, get_engine, init_db
+from api.resume_context import classify_question
+from api.retention import row_model_used_matches
+
+# Rows fetched per keyset page
+EXPORT_PAGE_SIZE = 1000
+
+
+def parse_timestamp(value: str | None) -> datetime | None:
+    """Parse an ISO 8601 filter value ('' / None means unbounded)."""
+    return datetime.fromisoformat(value) if value else None
+
+
+def iter_messages(
+    start: datetime | None = None,
+    end: datetime | None = None,
+    category: str | None = None,
+    model_used: str | None = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+) -> Iterator[dict]:
+    """Yield matching rows as dicts, oldest first, one keyset page at a time."""
+    init_db()
+    engine = get_engine()
+    table = ChatMessage.__table__
+
+    filters = []
+    if start is not None:
+        filters.append(table.c.created_at >= start)
+    if end is not None:
+        filters.append(table.c.created_at < end)
+    if model_used:
+        filters.append(row_model_used_matches(model_used))
+    if category:
+        category = category.upper()
+        filters.append(table.c.role == "user")
+
+    last_created, last_id = None, None
+    while True:
+        page_filters = list(filters)
+        if last_id is not None:
+            page_filters.append(
+                or_(
+                    table.c.created_at > last_created,
+                    and_(table.c.created_at == last_created, table.c.id > last_id),
+                )
+            )
+
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(table)
+                .where(*page_filters)
+                .order_by(table.c.created_at, table.c.id)
+                .limit(page_size)
+            ).all()
+
+        if not rows:
+            return
+
+        for row in rows:
+            row_category = classify_question(row.content) if row.role == "user" else None
+            if category and row_category != category:
+                continue
+            yield {
+                "id": row.id,
+                "session_id": row.session_id,
+                "role": row.role,
+                "content": row.content,
+                "model_used": row.model_used,
+                "category": row_category,
+                "created_at": row.created_at.isoformat() if row.created_at else None,
+            }
+
+        last_created, last_id = rows[-1].created_at, rows[-1].id
+        if len(rows) < page_size:
+            return
+
+
+def iter_ndjson(rows: Iterator[dict], compress: bool = False) -> Iterator[bytes]:
+    """Encode rows as NDJSON chunks (one per page of output), optionally gzipped."""
+    gzipper = zlib.compressobj(wbits=31) if compress else None  # wbits=31 → gzip container
+    buffer: list[str] = []
+
+    def _flush() -> bytes:
+        data = "".join(buffer).encode("utf-8")
+        buffer.clear()
+        return gzipper.compress(data) if gzipper else data
+
+    for row in rows:
+        buffer.append(json.dumps(row, ensure_ascii=False) + "\n")
+        if len(buffer) >= EXPORT_PAGE_SIZE:
+            chunk = _flush()
+            if chunk:
+                yield chunk
+
+    tail = _flush()
+    if gzipper:
+        tail += gzipper.flush()
+    if tail:
+        yield tail
@@ -0,0 +1,174 @@
+"""
+Category-aware adaptive generation budget.
+
+The system prompt asks for 2–4 sentences, yet every upstream call used to
+reserve max_tokens=300, and reasoning models could burn all of it inside
+<think>. The budget for a turn is now picked from:
+
+  1. The Layer 3 category   — e.g. ATTACK_NEGATIVE only needs a short reframe.
+  2. The question shape     — "list all / explain in detail" gets more room,
+                              a one-word greeting gets less.
+  3. Each model's history   — observed completion lengths and how often the
+                              model was cut off (finish_reason == "length").
+                              Concise models get a tighter cap; models that
+                              keep getting truncated get headroom.
+
+Reasoning models additionally get OpenRouter's `reasoning` parameter to turn
+thinking off (excluded reasoning is still generated and billed). Models that
+cannot switch it off keep some headroom, and recorded lengths leave out
+reasoning tokens so a model's learned budget reflects its visible answers.
+
+Shorter reservations finish sooner and free upstream capacity for other turns.
+"""
+
+import threading
+from collections import deque
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Configuration
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+# Base max_tokens per Layer 3 category (preset categories never reach the LLM)
+CATEGORY_BUDGETS = {
+    "PROFESSIONAL": 220,
+    "ATTACK_NEGATIVE": 160,
+}
+DEFAULT_BUDGET = 220
+
+# Question shape adjustments
+DETAIL_MARKERS = [
+    "in detail", "detailed", "elaborate", "all of", "all his", "list all",
+    "everything", "every project", "each project", "step by step", "tell me more",
+    "compare", "walk me through",
+]
+DETAIL_MULTIPLIER = 1.6
+SHORT_QUESTION_WORDS = 3
+SHORT_MULTIPLIER = 0.7
+
+# Hard bounds on any single request
+BUDGET_MIN_TOKENS = 96
+BUDGET_MAX_TOKENS = 480
+
+# Per-model adaptation
+OUTPUT_HISTORY_SIZE = 200      # completions remembered per model
+BUDGET_MIN_SAMPLES = 20        # observations before a model's history counts
+CONCISE_HEADROOM = 1.5         # cap = p90 observed length × this
+TRUNCATION_THRESHOLD = 0.15    # truncation rate above which we add headroom
+TRUNCATION_MULTIPLIER = 1.5
+
+# Models that emit chain-of-thought; matched as substrings of the model ID
+REASONING_MODELS = ["deepseek-r1", "qwen3-4b", "step-3.5"]
+REASONING_PARAMS = {"enabled": False}
+REASONING_HEADROOM = 1.5       # for models that reason regardless
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Observed output lengths
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+class OutputLengthTracker:
+    """
+    Thread-safe rolling record of completion lengths per model.
+
+    Fed from every successful upstream response; read when planning budgets
+    and exposed in /api/health for tuning.
+    """
+
+    def __init__(self, history_size: int = OUTPUT_HISTORY_SIZE):
+        self._history_size = history_size
+        self._samples: dict[str, deque[tuple[int, bool]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, completion_tokens: int, truncated: bool):
+        with self._lock:
+            samples = self._samples.get(model)
+            if samples is None:
+                samples = self._samples[model] = deque(maxlen=self._history_size)
+            samples.append((completion_tokens, truncated))
+
+    def summary(self, model: str) -> dict | None:
+        """{"samples", "p50", "p90", "truncation_rate"} or None without enough data."""
+        with self._lock:
+            samples = list(self._samples.get(model, ()))
+        if len(samples) < BUDGET_MIN_SAMPLES:
+            return None
+        lengths = sorted(tokens for tokens, _ in samples)
+        return {
+            "samples": len(samples),
+            "p50": lengths[len(lengths) // 2],
+            "p90": lengths[min(int(len(lengths) * 0.9), len(lengths) - 1)],
+            "truncation_rate": sum(1 for _, cut in samples if cut) / len(samples),
+        }
+
+    def get_stats(self) -> dict:
+        """Return per-model output stats (for health check)."""
+        with self._lock:
+            models = list(self._samples)
+        stats = {}
+        for model in models:
+            with self._lock:
+                samples = list(self._samples[model])
+            lengths = sorted(tokens for tokens, _ in samples)
+            stats[model] = {
+                "samples": len(samples),
+                "p50": lengths[len(lengths) // 2],
+                "max": lengths[-1],
+                "truncation_rate": round(sum(1 for _, cut in samples if cut) / len(samples), 3),
+            }
+        return stats
+
+
+# Singleton instance
+output_tracker = OutputLengthTracker()
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Budget planning
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+def _is_reasoning_model(model: str) -> bool:
+    return any(marker in model for marker in REASONING_MODELS)
+
+
+def _clamp(tokens: float) -> int:
+    return int(min(max(tokens, BUDGET_MIN_TOKENS), BUDGET_MAX_TOKENS))
+
+
+class GenerationBudget:
+    """Per-turn budget; `for_model()` gives the payload fields for one model."""
+
+    def __init__(self, base_tokens: int, tracker: OutputLengthTracker = output_tracker):
+        self.base_tokens = base_tokens
+        self._tracker = tracker
+
+    def for_model(self, model: str) -> dict:
+        tokens = float(self.base_tokens)
+
+        observed = self._tracker.summary(model)
+        if observed is not None:
+            if observed["truncation_rate"] > TRUNCATION_THRESHOLD:
+                tokens *= TRUNCATION_MULTIPLIER
+            else:
+                tokens = min(tokens, observed["p90"] * CONCISE_HEADROOM)
+
+        fields = {}
+        if _is_reasoning_model(model):
+            tokens *= REASONING_HEADROOM
+            fields["reasoning"] = dict(REASONING_PARAMS)
+
+        fields["max_tokens"] = _clamp(tokens)
+        return fields
+
+
+def plan_budget(category: str, question: str) -> GenerationBudget:
+    """Pick the base budget for a turn from its category and question shape."""
+    tokens = CATEGORY_BUDGETS.get(category, DEFAULT_BUDGET)
+
+    q_lower = question.lower()
+    if any(marker in q_lower for marker in DETAIL_MARKERS):
+        tokens *= DETAIL_MULTIPLIER
+    elif len(q_lower.split()) <= SHORT_QUESTION_WORDS:
+        tokens *= SHORT_MULTIPLIER
+
+    return GenerationBudget(_clamp(tokens))
@@ -0,0 +1,138 @@
+"""
+Idempotency keys for /api/chat.
+
+A client retry (network blip, double-click) carrying the same key as an
+earlier request must not start another upstream race or write duplicate rows:
+
+  - Key already completed → the stored response is returned as-is.
+  - Key still in flight   → the retry waits for the original call's result.
+  - Original call failed  → the key is dropped, so the next retry runs fresh.
+  - Key reused for a different request body → IdempotencyConflict (422),
+    instead of replaying a reply to some other message.
+
+Keys live in a bounded, in-memory TTL store (LRU eviction past
+IDEMPOTENCY_MAX_KEYS) — per-process, like the rate limiter.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "600"))          # seconds
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+IDEMPOTENCY_MAX_KEY_LENGTH = 255
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a request with a different body."""
+
+
+def request_fingerprint(*parts: str) -> str:
+    """Hash of the request fields a key must keep meaning the same thing."""
+    return hashlib.sha256("\x00".join(parts).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Maps key → (expires_at, Future, fingerprint). The Future is shared by the
+    original call and every concurrent retry; completed Futures double as the
+    response cache.
+
+    Runs on the event loop thread only, so no locks are needed.
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_keys: int = IDEMPOTENCY_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._entries: OrderedDict[str, tuple[float, asyncio.Future, str | None]] = OrderedDict()
+        self._hits = 0
+        self._joined = 0
+        self._conflicts = 0
+
+    def _evict(self, now: float):
+        """
+        Drop expired entries, then trim to capacity. Completed entries are kept
+        in completion order (oldest first), so the scan stops at the first one
+        that is still fresh. In-flight entries are skipped — their owner still
+        needs them.
+        """
+        excess = len(self._entries) - self.max_keys
+        stale = []
+        for key, (expires_at, fut, _) in self._entries.items():
+            if not fut.done():
+                continue
+            if expires_at > now and excess <= 0:
+                break
+            stale.append(key)
+            excess -= 1
+        for key in stale:
+            del self._entries[key]
+
+    async def run(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        fingerprint: str | None = None,
+    ) -> tuple[Any, bool]:
+        """
+        Return (result, replayed). `factory` runs at most once per live key;
+        `replayed` is True when the result came from an earlier/in-flight call.
+        Raises IdempotencyConflict if the key is live with another `fingerprint`.
+        """
+        while True:
+            now = time.monotonic()
+            self._evict(now)
+
+            entry = self._entries.get(key)
+            if entry is None:
+                break
+            _, fut, stored_fingerprint = entry
+            if stored_fingerprint != fingerprint:
+                self._conflicts += 1
+                raise IdempotencyConflict(key)
+            if fut.done():
+                self._hits += 1
+                return fut.result(), True
+
+            self._joined += 1
+            try:
+                return await asyncio.shield(fut), True
+            except asyncio.CancelledError:
+                if not fut.cancelled():
+                    raise  # this retry itself was cancelled
+                # The original call was cancelled — loop and take ownership
+
+        fut = asyncio.get_running_loop().create_future()
+        self._entries[key] = (time.monotonic() + self.ttl, fut, fingerprint)
+        try:
+            result = await factory()
+        except BaseException as exc:
+            # Failed or cancelled calls are not cached; waiters see the outcome
+            self._entries.pop(key, None)
+            if isinstance(exc, asyncio.CancelledError):
+                fut.cancel()
+            else:
+                fut.set_exception(exc)
+                fut.exception()  # mark retrieved: no "never retrieved" warning
+            raise
+        fut.set_result(result)
+        self._entries[key] = (time.monotonic() + self.ttl, fut, fingerprint)
+        self._entries.move_to_end(key)
+        return result, False
+
+    def get_stats(self) -> dict:
+        """Return current store stats (for health check)."""
+        return {
+            "keys": len(self._entries),
+            "replayed": self._hits,
+            "joined_in_flight": self._joined,
+            "conflicts": self._conflicts,
+        }
+
+
+# Singleton instance
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,90 @@
+"""
+Online migration of chat_messages primary keys from random uuid4 to uuid7.
+
+Rows written before the switch keep their random uuid4 IDs, which stay
+scattered across the primary-key index. This rewrites them in place:
+
+  - Each legacy row gets a uuid7 built from its own created_at, so the new
+    keys follow insertion order.
+  - Work happens oldest-first in small batches, one short transaction each,
+    so the app keeps serving (and inserting uuid7 rows) while it runs.
+  - It is idempotent and resumable: rows whose ID is already version 7 are
+    skipped, so an interrupted run just picks up where it stopped.
+
+After the rewrite, a VACUUM (or the retention job's incremental vacuum)
+rebuilds the index pages compactly.
+"""
+
+import time
+from datetime import timezone
+
+from sqlalchemy import func, select, text, update
+
+from api.database import ChatMessage, get_engine, init_db, uuid7
+
+MIGRATION_BATCH_SIZE = 500
+MIGRATION_BATCH_PAUSE = 0.05  # seconds between batches
+
+
+def _is_legacy_id():
+    # Version nibble is the 15th character of the canonical UUID string
+    return func.substr(ChatMessage.id, 15, 1) != "7"
+
+
+def count_legacy_ids() -> int:
+    """Number of rows still carrying non-uuid7 keys."""
+    init_db()
+    with get_engine().connect() as conn:
+        return conn.execute(
+            select(func.count()).select_from(ChatMessage.__table__).where(_is_legacy_id())
+        ).scalar()
+
+
+def migrate_to_uuid7(
+    batch_size: int = MIGRATION_BATCH_SIZE,
+    pause: float = MIGRATION_BATCH_PAUSE,
+    vacuum: bool = False,
+) -> dict:
+    """
+    Rewrite legacy primary keys to uuid7, oldest rows first.
+
+    Returns {"rows_migrated": int, "batches": int, "duration_s": float}.
+    """
+    started = time.perf_counter()
+    init_db()
+    engine = get_engine()
+    table = ChatMessage.__table__
+    migrated, batches = 0, 0
+
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.created_at)
+                .where(_is_legacy_id())
+                .order_by(table.c.created_at)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            for old_id, created_at in rows:
+                if created_at is not None:
+                    # Stored naive, written as UTC (see ChatMessage.created_at)
+                    ts_ms = int(created_at.replace(tzinfo=timezone.utc).timestamp() * 1000)
+                    new_id = uuid7(ts_ms)
+                else:
+                    new_id = uuid7()
+                conn.execute(update(table).where(table.c.id == old_id).values(id=new_id))
+        migrated += len(rows)
+        batches += 1
+        print(f"[MIGRATE] {migrated} rows rewritten")
+        time.sleep(pause)
+
+    if vacuum and engine.dialect.name == "sqlite":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+
+    return {
+        "rows_migrated": migrated,
+        "batches": batches,
+        "duration_s": round(time.perf_counter() - started, 3),
+    }
@@ -5,28 +5,48 @@ Security layers:
   Layer 1: Bulletproof system prompt (resume-only, positive, anti-hallucination)
   Layer 2: Post-response validation (backend catches bad outputs)
   Layer 3: Question classification (pre-filters before hitting LLM)
-  Rate Limiting: Per-IP sliding window to prevent DDoS/abuse
+  Rate Limiting: Per-IP sliding window to prevent DDoS/abuse, checked at the
+                 edge (api/edge.py) before routing and body parsing
 
 Endpoints:
   POST /api/chat         — Send a message, get AI response
   GET  /api/chat/history — Retrieve chat history for a session
+  WS   /api/chat/ws      — Persistent chat channel for one session
+  GET  /api/admin/export — Stream chat logs as NDJSON (X-Admin-Token)
   GET  /api/health       — Health check
 """
 
-from fastapi import FastAPI, Depends, HTTPException, Request
+import hmac
+import json
+import asyncio
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.requests import HTTPConnection
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from api.database import init_db, get_db, ChatMessage
-from api.openrouter_service import get_chat_response
-from api.resume_context import (
-    RESUME_SYSTEM_PROMPT,
-    classify_question,
-    validate_response,
-    CATEGORY_RESPONSES,
+from api.database import init_db, db_session, ChatMessage
+from api.content_store import content_store
+from api.settings import LAZY_INIT, ADMIN_TOKEN, AWAIT_REPLY_WRITES
+from api.responses import FastJSONResponse
+from api.export import iter_messages, iter_ndjson, parse_timestamp
+from api.openrouter_service import get_chat_response, get_provider_stats, close_providers
+from api.deadlines import Deadline, DeadlineExceeded, request_deadline, deadline_stats, answer_cache
+from api.generation_budget import plan_budget, output_tracker
+from api.profiles import CompiledProfile, profile_registry
+from api.idempotency import (
+    idempotency_store, IdempotencyConflict, request_fingerprint, IDEMPOTENCY_MAX_KEY_LENGTH,
 )
-from api.rate_limiter import check_rate_limit, rate_limiter, get_client_ip
+from api.context_cache import ContextCache
+from api.rate_limiter import check_limits, rate_limiter, get_client_ip
+from api.edge import EdgeFilterMiddleware, EDGE_MAX_BODY_BYTES
+from api.admission import admission_controller, AdmissionRejected
+from api import profiler
 
 # ── App Setup ──────────────────────────────────────────────────────────────────
 
@@ -36,6 +56,9 @@ app = FastAPI(
     version="2.0.0",
 )
 
+# Edge pre-filter — rate limits and body cap before routing (CORS wraps it)
+app.add_middleware(EdgeFilterMiddleware)
+
 # CORS — allow frontend dev server and production origins
 app.add_middleware(
     CORSMiddleware,
@@ -52,21 +75,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in profiler — only installed when PROFILE_SECRET or PROFILE_SAMPLE_RATE is set
+if profiler.is_enabled():
+    app.add_middleware(profiler.ProfilerMiddleware)
+
 
 @app.on_event("startup")
 def on_startup():
-    """Initialize the database on app start."""
-    init_db()
-    print("[OK] Database initialized")
+    """Initialize the database on app start (deferred to first use in LAZY_INIT mode)."""
+    if LAZY_INIT:
+        print("[OK] Database initialization deferred (cold-start mode)")
+    else:
+        init_db()
+        print("[OK] Database initialized")
     print("[OK] 3-layer defense system active")
     print("[OK] Rate limiter active")
 
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Finish background message writes, then close pooled upstream connections."""
+    await drain_message_writes()
+    await close_providers()
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """Fast 503 when too many chat turns are already racing upstream."""
+    print(f"[ADMISSION] {get_client_ip(request)} shed ({exc.reason}) — retry in {exc.retry_after}s")
+    return JSONResponse(
+        status_code=503,
+        content={
+            "detail": {
+                "error": "The assistant is busy right now. Please try again shortly.",
+                "retry_after": exc.retry_after,
+            }
+        },
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 # ── Schemas ────────────────────────────────────────────────────────────────────
 
 class ChatRequest(BaseModel):
     message: str
     session_id: str
+    # Alternative to the Idempotency-Key header: retries reuse the same ID
+    client_message_id: str | None = None
 
 
 class ChatResponse(BaseModel):
@@ -82,6 +137,53 @@ class ChatHistoryItem(BaseModel):
     created_at: str
 
 
+def _history_rows(db: Session, session_id: str) -> list[dict]:
+    """
+    A session's messages as ChatHistoryItem-shaped dicts, oldest first.
+
+    Selects only the needed columns and skips ORM objects and Pydantic models;
+    this is the dominant cost of the history endpoint for long sessions.
+    """
+    rows = (
+        db.query(ChatMessage.role, ChatMessage.content, ChatMessage.model_used, ChatMessage.created_at)
+        .filter(ChatMessage.session_id == session_id)
+        .order_by(ChatMessage.created_at.asc())
+        .all()
+    )
+    return [
+        {
+            "role": role,
+            "content": content,
+            "model_used": model_used,
+            "created_at": created_at.isoformat() if created_at else "",
+        }
+        for role, content, model_used, created_at in rows
+    ]
+
+
+def _session_history(session_id: str) -> list[dict]:
+    with db_session() as db:
+        return _history_rows(db, session_id)
+
+
+def get_profile(connection: HTTPConnection) -> CompiledProfile:
+    """
+    Resolve the portfolio profile for a request or WebSocket: the `X-Profile-Id`
+    header or `profile_id` query param first, then the Host header.
+    """
+    profile_id = connection.headers.get("x-profile-id") or connection.query_params.get("profile_id")
+    return profile_registry.get(profile_id=profile_id, host=connection.headers.get("host"))
+
+
+def _idempotency_scope(profile: CompiledProfile, session_id: str, key: str) -> str:
+    """Keys are scoped per profile and session so one client can't replay another's reply."""
+    return f"{profile.id}:{session_id}:{key[:IDEMPOTENCY_MAX_KEY_LENGTH]}"
+
+
+# Sanity cap for session IDs accepted on the WebSocket channel
+MAX_SESSION_ID_LENGTH = 128
+
+
 # ── Endpoints ──────────────────────────────────────────────────────────────────
 
 @app.get("/api/health")
@@ -92,117 +194,311 @@ def health_check():
         "service": "portfolio-chatbot-api",
         "version": "2.1.0",
         "rate_limiter": rate_limiter.get_stats(),
+        "admission": admission_controller.get_stats(),
+        "profiles": profile_registry.get_stats(),
+        "idempotency": idempotency_store.get_stats(),
+        "context_cache": context_cache.get_stats(),
+        "output_lengths": output_tracker.get_stats(),
+        "providers": get_provider_stats(),
+        "storage": content_store.get_stats(),
+        "deadlines": deadline_stats.get_stats(),
     }
 
 
-@app.post("/api/chat", response_model=ChatResponse, dependencies=[Depends(check_rate_limit("chat"))])
-async def chat(request: ChatRequest, db: Session = Depends(get_db)):
-    """
-    Main chat endpoint with 3-layer defense:
+# How many stored messages (including the current one) are sent as context
+HISTORY_CONTEXT_LIMIT = 20
 
-    Layer 3 (Pre-filter):  Classify the question and short-circuit obvious
-                           jailbreaks, off-topic, and sensitive queries.
-    Layer 1 (System Prompt): The LLM is constrained by a bulletproof system
-                             prompt with strict resume-only + positive rules.
-    Layer 2 (Post-validation): The AI response is validated for negativity,
-                               hallucination, and prompt leakage before returning.
+# Tail of each active session, so follow-up turns skip the history query
+context_cache = ContextCache(HISTORY_CONTEXT_LIMIT)
+
+# Latest queued write per session; each write waits for the previous one,
+# so a session's rows always land in order
+_session_writes: dict[str, asyncio.Task] = {}
+
+
+def _insert_messages(rows: list[dict]):
+    with db_session() as db:
+        db.add_all(ChatMessage(**row) for row in rows)
+        db.commit()
+
+
+def _write_done(session_id: str, task: asyncio.Task):
+    if _session_writes.get(session_id) is task:
+        del _session_writes[session_id]
+    if not task.cancelled() and task.exception() is not None:
+        print(f"[DB] Failed to save messages for session {session_id}: {task.exception()}")
+
+
+def queue_message_write(session_id: str, rows: list[dict]) -> asyncio.Task:
+    """Persist chat rows in the threadpool, after any earlier write for the session."""
+    previous = _session_writes.get(session_id)
+
+    async def write():
+        if previous is not None:
+            await asyncio.wait([previous])
+        await run_in_threadpool(_insert_messages, rows)
+
+    task = asyncio.create_task(write())
+    _session_writes[session_id] = task
+    task.add_done_callback(lambda t: _write_done(session_id, t))
+    return task
+
+
+async def wait_for_message_writes(session_id: str, timeout: float | None = None) -> bool:
     """
-    if not request.message.strip():
-        raise HTTPException(status_code=400, detail="Message cannot be empty.")
+    Read-your-writes: wait until the session's queued rows are in the DB.
+    Returns False if `timeout` ran out first (the writes still land later).
+    """
+    pending = _session_writes.get(session_id)
+    if pending is not None:
+        done, _ = await asyncio.wait([pending], timeout=timeout)
+        return bool(done)
+    return True
 
-    user_message = request.message.strip()
 
-    # ── LAYER 3: Question Classification (pre-filter) ──────────────────────
-    category = classify_question(user_message)
-    print(f"[L3] Category: {category} | Message: {user_message[:80]}...")
+async def settle_reply_write(task: asyncio.Task):
+    """With AWAIT_REPLY_WRITES (serverless), let the reply row land before responding."""
+    if AWAIT_REPLY_WRITES:
+        await asyncio.wait([task])
 
-    # Short-circuit for JAILBREAK, OFF_TOPIC, PERSONAL_SENSITIVE
-    if category in CATEGORY_RESPONSES:
-        preset_reply = CATEGORY_RESPONSES[category]
-
-        # Save user message to DB
-        user_msg = ChatMessage(
-            session_id=request.session_id,
-            role="user",
-            content=user_message,
-        )
-        db.add(user_msg)
 
-        # Save preset response to DB
-        assistant_msg = ChatMessage(
-            session_id=request.session_id,
-            role="assistant",
-            content=preset_reply,
-            model_used=f"preset:{category.lower()}",
+async def drain_message_writes():
+    pending = list(_session_writes.values())
+    if pending:
+        await asyncio.wait(pending)
+
+
+def _message_row(session_id: str, role: str, content: str, model_used: str | None = None) -> dict:
+    # created_at is fixed when the turn produces the row, not when the write lands
+    return {
+        "session_id": session_id,
+        "role": role,
+        "content": content,
+        "model_used": model_used,
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+def _recent_messages(session_id: str, before: datetime) -> list[dict]:
+    with db_session() as db:
+        rows = (
+            db.query(ChatMessage.role, ChatMessage.content)
+            .filter(ChatMessage.session_id == session_id, ChatMessage.created_at < before)
+            .order_by(ChatMessage.created_at.desc())
+            .limit(HISTORY_CONTEXT_LIMIT - 1)
+            .all()
         )
-        db.add(assistant_msg)
-        db.commit()
+    return [{"role": role, "content": content} for role, content in reversed(rows)]
 
-        return ChatResponse(
-            reply=preset_reply,
-            model_used=f"preset:{category.lower()}",
-            session_id=request.session_id,
+
+def _newest_message_at(session_id: str, before: datetime) -> datetime | None:
+    with db_session() as db:
+        return (
+            db.query(func.max(ChatMessage.created_at))
+            .filter(ChatMessage.session_id == session_id, ChatMessage.created_at < before)
+            .scalar()
         )
 
-    # ── Save user message to DB ────────────────────────────────────────────
-    user_msg = ChatMessage(
-        session_id=request.session_id,
-        role="user",
-        content=user_message,
-    )
-    db.add(user_msg)
-    db.commit()
 
-    # ── Load recent conversation history for context (last 20 messages) ────
-    recent_db_messages = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.session_id == request.session_id)
-        .order_by(ChatMessage.created_at.asc())
-        .limit(20)
-        .all()
-    )
+def _naive_utc(value: datetime) -> datetime:
+    # SQLite hands back naive UTC; rows built in this process are aware
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
 
-    # ── LAYER 1: Build messages with bulletproof system prompt ──────────────
-    messages = [{"role": "system", "content": RESUME_SYSTEM_PROMPT}]
 
-    # For ATTACK_NEGATIVE questions, inject an extra reinforcement message
-    if category == "ATTACK_NEGATIVE":
-        messages.append({
-            "role": "system",
-            "content": (
-                "[REINFORCEMENT] The user is asking a question that could lead to "
-                "negative statements about Harsh. Remember: ALWAYS reframe positively. "
-                "Highlight Harsh's strengths. NEVER say anything negative."
-            ),
-        })
+# Freshness checks run alongside the race; referenced here until they finish
+_freshness_checks: set[asyncio.Task] = set()
 
-    for msg in recent_db_messages:
-        messages.append({"role": msg.role, "content": msg.content})
 
-    # ── Call the LLM ───────────────────────────────────────────────────────
+async def _check_context_fresh(session_id: str, before: datetime, cached_at: datetime):
+    """Drop the cached tail if another process stored messages newer than it."""
     try:
-        result = await get_chat_response(messages)
+        newest = await run_in_threadpool(_newest_message_at, session_id, before)
     except Exception as e:
-        print(f"[ERROR] LLM call failed: {e}")
-        error_content = (
-            "I'm having trouble connecting right now. Please try again in a moment, "
-            "or reach out to Harsh directly at harshme08@gmail.com! 😊"
+        print(f"[CONTEXT] Freshness check failed for session {session_id}: {e}")
+        context_cache.invalidate(session_id)
+        return
+    if newest is not None and _naive_utc(newest) > _naive_utc(cached_at):
+        print(f"[CONTEXT] Session {session_id} moved on in another process — dropping cached context")
+        context_cache.invalidate(session_id)
+
+
+async def _prior_context(
+    session_id: str, previous_write: asyncio.Task | None, before: datetime
+) -> tuple[list[dict], datetime | None]:
+    """
+    The session's messages before this turn: from the cache, else read from
+    the DB. The second item is the cached tail's newest created_at (None when
+    read from the DB), for the freshness check.
+    """
+    cached_at = context_cache.newest_at(session_id)
+    cached = context_cache.get(session_id)
+    if cached is not None:
+        return cached, cached_at
+    if previous_write is not None:
+        await asyncio.wait([previous_write])
+    return await run_in_threadpool(_recent_messages, session_id, before), None
+
+
+def _fallback_reply(profile: CompiledProfile, user_message: str, first_question: bool) -> tuple[str, str]:
+    """
+    (reply, model_used) when the race failed or missed the deadline: a cached
+    answer to the same first question, then the profile's facts, then the
+    error reply.
+    """
+    if first_question:
+        cached = answer_cache.get(profile.id, user_message)
+        if cached is not None:
+            deadline_stats.record("fallback_cached")
+            return cached, "fallback:cached"
+    facts = profile.fact_answer(user_message)
+    if facts is not None:
+        deadline_stats.record("fallback_facts")
+        return facts, "fallback:facts"
+    deadline_stats.record("fallback_error")
+    return profile.error_reply, "none"
+
+
+async def run_chat_turn(
+    profile: CompiledProfile,
+    session_id: str,
+    user_message: str,
+    history: list[dict] | None = None,
+    deadline: Deadline | None = None,
+) -> ChatResponse:
+    """
+    Run one chat turn through the 3-layer defense and persist both sides.
+
+    Shared by the HTTP and WebSocket endpoints. `profile` supplies the prompt,
+    classifier and validator. `history` is the session's prior messages as
+    {"role", "content"} dicts; when None it comes from the context cache or
+    the DB.
+
+    The turn is pipelined: the user message is written while the upstream
+    race runs (and is awaited before replying, so a failed write still fails
+    the request), and the assistant row is written after the response is
+    sent. The fallback reply is persisted the same way. Writes left running
+    after the response are not guaranteed on serverless platforms, which may
+    freeze the function once it has answered; AWAIT_REPLY_WRITES (on under
+    Vercel) waits for them instead.
+
+    `deadline` (default: the "chat" budget) bounds the whole turn: the
+    context read and the user-row wait give up when it runs out, and the
+    model race is cut off early enough to answer from the fallback chain
+    (see api/deadlines.py) instead.
+    """
+    if deadline is None:
+        deadline = request_deadline("chat")
+    deadline_stats.record("turns")
+
+    # ── LAYER 3: Question Classification (pre-filter) ──────────────────────
+    category = profile.classify(user_message)
+    print(f"[L3] Category: {category} | Profile: {profile.id} | Message: {user_message[:80]}...")
+
+    # Short-circuit for JAILBREAK, OFF_TOPIC, PERSONAL_SENSITIVE
+    if category in profile.category_responses:
+        preset_reply = profile.category_responses[category]
+
+        # Save user message + preset response (off the response path)
+        rows = [
+            _message_row(session_id, "user", user_message),
+            _message_row(session_id, "assistant", preset_reply, f"preset:{category.lower()}"),
+        ]
+        reply_write = queue_message_write(session_id, rows)
+        context_cache.extend(
+            session_id,
+            [{"role": r["role"], "content": r["content"]} for r in rows],
+            rows[-1]["created_at"],
         )
-        error_msg = ChatMessage(
-            session_id=request.session_id,
-            role="assistant",
-            content=error_content,
+
+        await settle_reply_write(reply_write)
+        return ChatResponse(
+            reply=preset_reply,
+            model_used=f"preset:{category.lower()}",
+            session_id=session_id,
         )
-        db.add(error_msg)
-        db.commit()
+
+    # ── Admission control: cap concurrent upstream races ───────────────────
+    # Raises AdmissionRejected (→ 503 + Retry-After) when saturated, before
+    # anything is written, so shed requests leave no orphaned user message.
+    async with admission_controller.admit(deadline) as slot:
+        # ── Save user message to DB (runs alongside the race) ──────────────
+        previous_write = _session_writes.get(session_id)
+        user_row = _message_row(session_id, "user", user_message)
+        user_write = queue_message_write(session_id, [user_row])
+
+        # ── Recent conversation history for context (last 20 messages) ─────
+        cached_at = None
+        if history is None:
+            try:
+                prior, cached_at = await asyncio.wait_for(
+                    _prior_context(session_id, previous_write, before=user_row["created_at"]),
+                    timeout=deadline.remaining_for_upstream(),
+                )
+            except asyncio.TimeoutError:
+                # Race with the question alone rather than miss the deadline
+                deadline_stats.record("context_timeouts")
+                prior = None
+        else:
+            prior = history
+        user_entry = [{"role": "user", "content": user_message}]
+        context = (prior or [])[-(HISTORY_CONTEXT_LIMIT - 1):] + user_entry
+        if cached_at is not None:
+            # Cache hit: append, keeping the expiry set when the tail was read from the DB
+            context_cache.extend(session_id, user_entry, user_row["created_at"])
+        elif prior is not None:
+            context_cache.put(session_id, context, user_row["created_at"])
+        if cached_at is not None:
+            check = asyncio.create_task(
+                _check_context_fresh(session_id, user_row["created_at"], cached_at)
+            )
+            _freshness_checks.add(check)
+            check.add_done_callback(_freshness_checks.discard)
+
+        # ── LAYER 1: Build messages with bulletproof system prompt ──────────
+        messages = [{"role": "system", "content": profile.system_prompt}]
+
+        # For ATTACK_NEGATIVE questions, inject an extra reinforcement message
+        if category == "ATTACK_NEGATIVE":
+            messages.append({"role": "system", "content": profile.reinforcement})
+
+        messages.extend(context)
+
+        # ── Call the LLM ───────────────────────────────────────────────────
+        try:
+            result = await get_chat_response(
+                messages, budget=plan_budget(category, user_message), deadline=deadline
+            )
+        except DeadlineExceeded as e:
+            slot.failed()
+            deadline_stats.record("race_misses")
+            print(f"[DEADLINE] {e}")
+            result = None
+        except Exception as e:
+            slot.failed()
+            print(f"[ERROR] LLM call failed: {e}")
+            result = None
+
+    # A failed user write still fails the request; a slow one is left to land
+    done, _ = await asyncio.wait([user_write], timeout=deadline.remaining())
+    if done:
+        user_write.result()
+    else:
+        deadline_stats.record("write_waits_abandoned")
+
+    if result is None:
+        reply, model_label = _fallback_reply(profile, user_message, first_question=prior == [])
+        reply_row = _message_row(session_id, "assistant", reply, None if model_label == "none" else model_label)
+        reply_write = queue_message_write(session_id, [reply_row])
+        context_cache.extend(session_id, [{"role": "assistant", "content": reply}], reply_row["created_at"])
+        await settle_reply_write(reply_write)
         return ChatResponse(
-            reply=error_content,
-            model_used="none",
-            session_id=request.session_id,
+            reply=reply,
+            model_used=model_label,
+            session_id=session_id,
         )
 
     # ── LAYER 2: Post-response validation ──────────────────────────────────
-    validation = validate_response(result["content"])
+    validation = profile.validate(result["content"])
 
     if not validation["is_safe"]:
         print(f"[L2] BLOCKED — Issues: {validation['issues']}")
@@ -212,40 +508,256 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
         print(f"[L2] PASSED — Response is safe")
         final_reply = result["content"]
         model_label = result["model_used"]
+        if prior == []:
+            # Stands on its own, so it can answer this question when a later race misses
+            answer_cache.put(profile.id, user_message, final_reply)
 
-    # ── Save assistant response to DB ──────────────────────────────────────
-    assistant_msg = ChatMessage(
-        session_id=request.session_id,
-        role="assistant",
-        content=final_reply,
-        model_used=model_label,
-    )
-    db.add(assistant_msg)
-    db.commit()
+    # ── Save assistant response to DB (off the response path) ──────────────
+    reply_row = _message_row(session_id, "assistant", final_reply, model_label)
+    reply_write = queue_message_write(session_id, [reply_row])
+    context_cache.extend(session_id, [{"role": "assistant", "content": final_reply}], reply_row["created_at"])
+    await settle_reply_write(reply_write)
+
+    if deadline.expired:
+        deadline_stats.record("late_responses")
 
     return ChatResponse(
         reply=final_reply,
         model_used=model_label,
-        session_id=request.session_id,
+        session_id=session_id,
     )
 
 
-@app.get("/api/chat/history", response_model=list[ChatHistoryItem], dependencies=[Depends(check_rate_limit("history"))])
-def get_chat_history(session_id: str, db: Session = Depends(get_db)):
-    """Retrieve chat history for a given session."""
-    messages = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.session_id == session_id)
-        .order_by(ChatMessage.created_at.asc())
-        .all()
-    )
+@app.post("/api/chat", response_model=ChatResponse)
+async def chat(
+    request: ChatRequest,
+    profile: CompiledProfile = Depends(get_profile),
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key"),
+    deadline_ms: str | None = Header(default=None, alias="X-Deadline-Ms"),
+):
+    """
+    Main chat endpoint with 3-layer defense:
 
-    return [
-        ChatHistoryItem(
-            role=msg.role,
-            content=msg.content,
-            model_used=msg.model_used,
-            created_at=msg.created_at.isoformat() if msg.created_at else "",
+    Layer 3 (Pre-filter):  Classify the question and short-circuit obvious
+                           jailbreaks, off-topic, and sensitive queries.
+    Layer 1 (System Prompt): The LLM is constrained by a bulletproof system
+                             prompt with strict resume-only + positive rules.
+    Layer 2 (Post-validation): The AI response is validated for negativity,
+                               hallucination, and prompt leakage before returning.
+
+    An `X-Deadline-Ms` header asks for a different time budget than the
+    default (clamped; see api/deadlines.py).
+    """
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty.")
+    if idempotency_key and len(idempotency_key) > IDEMPOTENCY_MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long.")
+    if request.client_message_id and len(request.client_message_id) > IDEMPOTENCY_MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="client_message_id is too long.")
+
+    user_message = request.message.strip()
+    deadline = request_deadline("chat", deadline_ms)
+    key = idempotency_key or request.client_message_id
+    if not key:
+        response = await run_chat_turn(profile, request.session_id, user_message, deadline=deadline)
+        return FastJSONResponse(response.model_dump())
+
+    # Retries with the same key share one turn: no second race, no duplicate rows
+    try:
+        response, replayed = await idempotency_store.run(
+            _idempotency_scope(profile, request.session_id, key),
+            lambda: run_chat_turn(profile, request.session_id, user_message, deadline=deadline),
+            fingerprint=request_fingerprint(user_message),
         )
-        for msg in messages
-    ]
+    except IdempotencyConflict:
+        raise HTTPException(
+            status_code=422, detail="Idempotency key was already used for a different message."
+        )
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return FastJSONResponse(response.model_dump(), headers=headers)
+
+
+@app.websocket("/api/chat/ws")
+async def chat_ws(websocket: WebSocket):
+    """
+    Persistent chat channel for one session.
+
+    Connect with `?session_id=...` (and optionally `&profile_id=...`). The session is checked once on connect and
+    its history is pushed immediately ({"type": "history"}), replacing the
+    separate /api/chat/history fetch. Each {"message": "..."} sent afterwards
+    gets a {"type": "reply"} (or {"type": "error"}) on the same socket; an
+    optional "client_message_id" makes resends idempotent, as on POST /api/chat, and
+    an optional "deadline_ms" works like the X-Deadline-Ms header. The
+    session's context stays in memory, so turns skip the history query.
+
+    Messages count against the same per-IP RATE_LIMITS["chat"] budget as
+    POST /api/chat, so opening extra sockets does not multiply the limit, and
+    frames are capped at EDGE_MAX_BODY_BYTES like HTTP request bodies.
+    """
+    session_id = websocket.query_params.get("session_id", "").strip()
+    if not session_id or len(session_id) > MAX_SESSION_ID_LENGTH:
+        await websocket.close(code=1008)
+        return
+
+    profile = get_profile(websocket)
+    client_ip = get_client_ip(websocket)
+    if not rate_limiter.is_allowed(client_ip, "global")["allowed"]:
+        print(f"[RATE LIMIT] {client_ip} hit global limit on WebSocket connect")
+        await websocket.close(code=1013)
+        return
+
+    await websocket.accept()
+
+    # Rows of a turn that just finished may still be queued for writing
+    if not await wait_for_message_writes(session_id, timeout=request_deadline("history").remaining()):
+        deadline_stats.record("write_waits_abandoned")
+    stored = await run_in_threadpool(_session_history, session_id)
+    await websocket.send_json({"type": "history", "messages": stored})
+    history = [{"role": row["role"], "content": row["content"]} for row in stored]
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            raw = message.get("text") or message.get("bytes") or ""
+            # The edge body cap only sees HTTP requests; apply it per frame here
+            size = len(raw.encode() if isinstance(raw, str) else raw)
+            if size > EDGE_MAX_BODY_BYTES:
+                await websocket.send_json({
+                    "type": "error",
+                    "error": "Message too large.",
+                    "max_bytes": EDGE_MAX_BODY_BYTES,
+                })
+                continue
+            try:
+                data = json.loads(raw)
+            except ValueError:
+                await websocket.send_json({"type": "error", "error": "Messages must be JSON."})
+                continue
+            user_message = str(data.get("message", "")).strip() if isinstance(data, dict) else ""
+            if not user_message:
+                await websocket.send_json({"type": "error", "error": "Message cannot be empty."})
+                continue
+
+            rejected = check_limits(client_ip, "chat")
+            if rejected:
+                print(f"[RATE LIMIT] {client_ip} hit {rejected['scope']} limit on WebSocket — retry in {rejected['retry_after']}s")
+                await websocket.send_json({
+                    "type": "error",
+                    "error": "Too many requests. Please slow down.",
+                    "retry_after": rejected["retry_after"],
+                    "limit": rejected["limit"],
+                })
+                continue
+
+            client_message_id = data.get("client_message_id")
+            if client_message_id and len(str(client_message_id)) > IDEMPOTENCY_MAX_KEY_LENGTH:
+                await websocket.send_json({"type": "error", "error": "client_message_id is too long."})
+                continue
+            deadline = request_deadline("ws", data.get("deadline_ms"))
+            try:
+                if client_message_id:
+                    response, replayed = await idempotency_store.run(
+                        _idempotency_scope(profile, session_id, str(client_message_id)),
+                        lambda: run_chat_turn(profile, session_id, user_message, history, deadline),
+                        fingerprint=request_fingerprint(user_message),
+                    )
+                else:
+                    response = await run_chat_turn(profile, session_id, user_message, history, deadline)
+                    replayed = False
+            except AdmissionRejected as exc:
+                await websocket.send_json({
+                    "type": "error",
+                    "error": "The assistant is busy right now. Please try again shortly.",
+                    "retry_after": exc.retry_after,
+                })
+                continue
+            except IdempotencyConflict:
+                await websocket.send_json({
+                    "type": "error",
+                    "error": "client_message_id was already used for a different message.",
+                })
+                continue
+            except Exception as e:
+                # e.g. the user row failed to save — report it, keep the socket open
+                print(f"[WS] Chat turn failed for session {session_id}: {e}")
+                await websocket.send_json({"type": "error", "error": "Something went wrong. Please try again."})
+                continue
+
+            if not replayed:
+                history.append({"role": "user", "content": user_message})
+                history.append({"role": "assistant", "content": response.reply})
+                # Only the tail is ever sent as context
+                del history[:-HISTORY_CONTEXT_LIMIT]
+
+            await websocket.send_json({"type": "reply", "replayed": replayed, **response.model_dump()})
+    except WebSocketDisconnect:
+        pass
+
+
+@app.get("/api/chat/history", response_model=list[ChatHistoryItem])
+async def get_chat_history(
+    session_id: str,
+    deadline_ms: str | None = Header(default=None, alias="X-Deadline-Ms"),
+):
+    """
+    Retrieve chat history for a given session.
+
+    Waits for the session's queued message writes first (within the request
+    deadline), so a reply that was just returned is normally included. Rows
+    are serialized straight to JSON; `response_model` only documents the
+    shape (returning a Response skips FastAPI's re-validation).
+    """
+    deadline = request_deadline("history", deadline_ms)
+    if not await wait_for_message_writes(session_id, timeout=deadline.remaining()):
+        deadline_stats.record("write_waits_abandoned")
+    try:
+        rows = await asyncio.wait_for(
+            run_in_threadpool(_session_history, session_id), timeout=deadline.remaining()
+        )
+    except asyncio.TimeoutError:
+        deadline_stats.record("history_timeouts")
+        raise HTTPException(status_code=504, detail="Chat history took too long. Please try again.")
+    return FastJSONResponse(rows)
+
+
+@app.get("/api/admin/export")
+def export_chat_logs(
+    http_request: Request,
+    start: str | None = None,
+    end: str | None = None,
+    category: str | None = None,
+    model_used: str | None = None,
+    gzip: bool = False,
+):
+    """
+    Stream chat_messages as NDJSON (optionally gzip) for offline analysis.
+
+    Requires the X-Admin-Token header to match ADMIN_TOKEN; the endpoint does
+    not exist when ADMIN_TOKEN is unset. Rows are read in short keyset pages
+    from a worker thread, so the export never blocks live chat requests.
+    """
+    token = http_request.headers.get("x-admin-token", "")
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+    try:
+        rows = iter_messages(
+            start=parse_timestamp(start),
+            end=parse_timestamp(end),
+            category=category,
+            model_used=model_used,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start/end must be ISO 8601 timestamps.")
+
+    filename = "chat_messages.ndjson.gz" if gzip else "chat_messages.ndjson"
+    # A sync iterator is consumed in Starlette's threadpool, off the event loop
+    return StreamingResponse(
+        iter_ndjson(rows, compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
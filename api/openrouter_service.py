@@ -1,16 +1,18 @@
 """
-OpenRouter API service with parallel model requests.
-Fires requests to ALL free models simultaneously and uses whichever responds first.
+LLM service with parallel model requests across providers.
+Fires requests to ALL models of ALL configured providers simultaneously and
+uses whichever responds first.
 """
 
 import os
-import re
 import asyncio
-import httpx
-from pathlib import Path
-from dotenv import load_dotenv
 
-load_dotenv(Path(__file__).parent / ".env")
+from api.settings import load_env
+from api.deadlines import Deadline, DeadlineExceeded
+from api.generation_budget import GenerationBudget
+from api.providers import Provider, clean_response  # noqa: F401 — re-exported
+
+load_env()
 
 OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "")
@@ -31,96 +33,108 @@ FREE_MODELS = [
 ]
 
 
-def clean_response(text: str) -> str:
-    """Strip <think>...</think> blocks from reasoning model outputs."""
-    if not text:
-        return ""
-    cleaned = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
-    return cleaned if cleaned else text.strip()
+# Optional self-hosted OpenAI-compatible server (llama.cpp / vLLM / Ollama)
+LOCAL_LLM_URL = os.getenv("LOCAL_LLM_URL", "")
+LOCAL_LLM_API_KEY = os.getenv("LOCAL_LLM_API_KEY", "")
+LOCAL_LLM_MODELS = [m.strip() for m in os.getenv("LOCAL_LLM_MODELS", "local").split(",") if m.strip()]
+LOCAL_LLM_TIMEOUT = float(os.getenv("LOCAL_LLM_TIMEOUT", "20"))
 
 
-async def _try_model(
-    client: httpx.AsyncClient,
-    model: str,
-    headers: dict,
-    messages: list[dict],
-    max_tokens: int,
-    temperature: float,
-) -> dict | None:
-    """
-    Try a single model. Returns the parsed result dict on success, or None on failure.
-    """
-    payload = {
-        "model": model,
-        "messages": messages,
-        "max_tokens": max_tokens,
-        "temperature": temperature,
-    }
-    try:
-        response = await client.post(
+def _configured_providers() -> list[Provider]:
+    providers = []
+    if OPENROUTER_API_KEY:
+        providers.append(Provider(
+            "openrouter",
             OPENROUTER_API_URL,
-            headers=headers,
-            json=payload,
-        )
+            FREE_MODELS,
+            api_key=OPENROUTER_API_KEY,
+            extra_headers={
+                "HTTP-Referer": "https://harsh-srivastava.dev",
+                "X-Title": "Harsh Srivastava Portfolio",
+            },
+            supports_reasoning=True,
+        ))
+    if LOCAL_LLM_URL:
+        providers.append(Provider(
+            "local",
+            LOCAL_LLM_URL,
+            LOCAL_LLM_MODELS,
+            api_key=LOCAL_LLM_API_KEY,
+            timeout=LOCAL_LLM_TIMEOUT,
+        ))
+    return providers
 
-        if response.status_code == 200:
-            data = response.json()
-            raw_content = (
-                data.get("choices", [{}])[0]
-                .get("message", {})
-                .get("content", "")
-            )
-            content = clean_response(raw_content)
-            if content:
-                return {"content": content, "model_used": model}
 
-        # Log non-200 for debugging
-        if response.status_code != 200:
-            print(f"[{response.status_code}] {model}")
+PROVIDERS = _configured_providers()
+
 
-    except httpx.TimeoutException:
-        print(f"[TIMEOUT] {model}")
-    except Exception as e:
-        print(f"[ERROR] {model}: {e}")
+def get_provider_stats() -> dict:
+    """Return per-provider stats (for health check)."""
+    return {provider.name: provider.get_stats() for provider in PROVIDERS}
 
-    return None
+
+async def close_providers():
+    """Close every provider's connection pool (app shutdown)."""
+    for provider in PROVIDERS:
+        await provider.aclose()
 
 
 async def get_chat_response(
     messages: list[dict],
     max_tokens: int = 300,
     temperature: float = 0.3,
+    budget: GenerationBudget | None = None,
+    deadline: Deadline | None = None,
 ) -> dict:
     """
-    Fire requests to ALL models in parallel and return the first successful response.
-    This dramatically reduces latency compared to sequential fallback.
+    Fire requests to ALL models of every provider in parallel and return the
+    first successful response. This dramatically reduces latency compared to
+    sequential fallback, and each provider is the others' fallback.
+
+    With a `budget`, each model gets its own max_tokens (and reasoning settings);
+    otherwise every model gets the flat `max_tokens`.
+
+    With a `deadline`, the race gets what is left of it minus the fallback
+    reserve; if no model has answered by then, the remaining tasks are
+    cancelled and DeadlineExceeded is raised.
     """
-    if not OPENROUTER_API_KEY:
-        raise ValueError("OPENROUTER_API_KEY is not set in environment variables.")
-
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "HTTP-Referer": "https://harsh-srivastava.dev",
-        "X-Title": "Harsh Srivastava Portfolio",
-    }
-
-    async with httpx.AsyncClient(timeout=20.0) as client:
-        # Create a task for each model
-        tasks = [
-            asyncio.create_task(
-                _try_model(client, model, headers, messages, max_tokens, temperature)
+    if not PROVIDERS:
+        raise ValueError(
+            "No LLM provider configured: set OPENROUTER_API_KEY and/or LOCAL_LLM_URL."
+        )
+
+    # Create a task for each (provider, model) pair
+    tasks = {}
+    for provider in PROVIDERS:
+        for model in provider.models:
+            generation = (
+                budget.for_model(provider.label(model)) if budget else {"max_tokens": max_tokens}
+            )
+            task = asyncio.create_task(
+                provider.complete(model, messages, generation, temperature)
             )
-            for model in FREE_MODELS
-        ]
+            tasks[task] = provider
 
+    try:
         # As each task completes, check if it succeeded
-        for coro in asyncio.as_completed(tasks):
-            result = await coro
+        timeout = deadline.remaining_for_upstream() if deadline else None
+        for coro in asyncio.as_completed(tasks, timeout=timeout):
+            try:
+                result = await coro
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(
+                    f"No model answered within the {deadline.budget_s:g}s request deadline."
+                ) from None
             if result is not None:
-                # Cancel all remaining tasks to save resources
-                for task in tasks:
-                    task.cancel()
+                for task, provider in tasks.items():
+                    if task.done() and not task.cancelled() and task.result() is result:
+                        provider.record_win()
+                        result["provider"] = provider.name
+                        break
                 return result
+    finally:
+        # Cancel all remaining tasks to save resources
+        for task in tasks:
+            task.cancel()
 
     raise RuntimeError("All models failed. Please try again shortly.")
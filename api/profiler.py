@@ -0,0 +1,338 @@
+"""
+Opt-in per-request profiler for the Portfolio API.
+
+Profiles a request when either:
+  - the `X-Profile-Token` header matches PROFILE_SECRET, or
+  - it is the 1-in-N request selected by PROFILE_SAMPLE_RATE.
+
+The middleware is only installed when one of those triggers is configured,
+so a disabled profiler adds zero overhead to the request path.
+
+Modes (PROFILE_MODE):
+  - "sample":   a background thread samples the coroutine chains of the
+                request's task and the tasks it spawns (e.g. the model race)
+                every PROFILE_INTERVAL_MS, including time suspended in upstream
+                awaits, and writes collapsed stacks (`.folded`) — feed them to
+                flamegraph.pl, speedscope or inferno directly.
+  - "cprofile": runs cProfile during the steps of those same tasks only and
+                writes a `.prof` pstats dump (convert with flameprof / snakeviz).
+
+Output goes to PROFILE_DIR, which is capped at PROFILE_MAX_FILES (oldest pruned).
+"""
+
+import os
+import sys
+import time
+import hmac
+import asyncio
+import cProfile
+import collections.abc
+import itertools
+import threading
+from collections import Counter
+from pathlib import Path
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Configuration
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+PROFILE_SECRET = os.getenv("PROFILE_SECRET", "")
+PROFILE_SAMPLE_RATE = int(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 1-in-N, 0 = off
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sample")                # "sample" | "cprofile"
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "/tmp/portfolio-profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+
+# Only these paths are ever profiled
+PROFILE_PATHS = {"/api/chat"}
+
+PROFILE_HEADER = b"x-profile-token"
+
+
+def is_enabled() -> bool:
+    """True if any profiling trigger is configured."""
+    return bool(PROFILE_SECRET) or PROFILE_SAMPLE_RATE > 0
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Profilers
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+class _TaskTracker:
+    """
+    Follows one request's task and every task it spawns (transitively), by
+    installing a task factory on the loop for the duration of the profile.
+    """
+
+    def __init__(self):
+        self._tasks: dict[asyncio.Task, asyncio.Task | None] = {}   # task → parent
+        self._loop = None
+        self._previous_factory = None
+
+    def _attach(self, loop, root: asyncio.Task):
+        self._loop = loop
+        self._tasks[root] = None
+        self._previous_factory = loop.get_task_factory()
+        loop.set_task_factory(self._factory)
+
+    def _detach(self):
+        self._loop.set_task_factory(self._previous_factory)
+
+    def _factory(self, loop, coro, **kwargs):
+        parent = asyncio.current_task(loop)
+        tracked = parent in self._tasks
+        if tracked:
+            coro = self._wrap(coro)
+        if self._previous_factory is not None:
+            task = self._previous_factory(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        if tracked:
+            self._tasks[task] = parent
+        return task
+
+    def _wrap(self, coro):
+        return coro
+
+    def wrap(self, coro):
+        """The request coroutine to await in place of `coro`."""
+        return self._wrap(coro)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _await_chain(coro) -> tuple[list[str], object]:
+    """
+    Labels of a suspended or running coroutine chain (outermost first) and
+    the innermost frame. A chain ending in a non-coroutine awaitable (a
+    Future, an async generator step) gets an `<await Type>` leaf.
+    """
+    labels, innermost = [], None
+    while coro is not None:
+        for frame_attr, await_attr in (("cr_frame", "cr_await"), ("gi_frame", "gi_yieldfrom"), ("ag_frame", "ag_await")):
+            if hasattr(coro, frame_attr):
+                break
+        else:
+            labels.append(f"<await {type(coro).__name__}>")
+            break
+        frame = getattr(coro, frame_attr)
+        if frame is None:  # finished
+            break
+        labels.append(_frame_label(frame))
+        innermost = frame
+        coro = getattr(coro, await_attr)
+    return labels, innermost
+
+
+class StackSampler(_TaskTracker):
+    """
+    Samples the coroutine chains of one request's tasks at a fixed interval.
+
+    The event loop thread's own stack only shows the selector while a request
+    is suspended in an await, and shows other requests' steps otherwise, so
+    each tracked task's chain is walked from its coroutine (`cr_frame` /
+    `cr_await`) instead. A task that is running at sample time also gets the
+    synchronous frames above its innermost coroutine. Child tasks (e.g. the
+    model race) are nested under their parent's current chain, one stack per
+    live task per sample — widths are task time, not wall time.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        super().__init__()
+        self._interval = interval_ms / 1000
+        self._thread_id = None
+        self._stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _running_frames(self, innermost, thread_frame) -> list[str]:
+        """Synchronous frames on top of `innermost` if it is executing right now."""
+        above = []
+        frame = thread_frame
+        while frame is not None:
+            if frame is innermost:
+                return [_frame_label(f) for f in reversed(above)]
+            above.append(frame)
+            frame = frame.f_back
+        return []
+
+    def _sample(self):
+        thread_frame = sys._current_frames().get(self._thread_id)
+        chains: dict[asyncio.Task, list[str]] = {}
+        tasks = dict(self._tasks)
+
+        def chain(task) -> list[str]:
+            if task not in chains:
+                labels, innermost = _await_chain(task.get_coro())
+                if innermost is not None and not labels[-1].startswith("<await"):
+                    labels += self._running_frames(innermost, thread_frame)
+                parent = tasks.get(task)
+                prefix = chain(parent) if parent is not None else []
+                if prefix and prefix[-1].startswith("<await"):
+                    prefix = prefix[:-1]   # the child is what the parent is waiting on
+                chains[task] = prefix + labels
+            return chains[task]
+
+        for task in tasks:
+            if not task.done():
+                stack = chain(task)
+                if stack:
+                    # Collapsed format is root-first, ';'-separated
+                    self._stacks[";".join(stack)] += 1
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self._sample()
+
+    def start(self):
+        self._attach(asyncio.get_running_loop(), asyncio.current_task())
+        self._thread_id = threading.get_ident()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._detach()
+
+    def write(self, path: Path):
+        """Write collapsed stacks (`frame;frame;frame count` per line)."""
+        lines = [f"{stack} {count}" for stack, count in self._stacks.most_common()]
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+class _ProfiledCoroutine(collections.abc.Coroutine):
+    """Drives a coroutine with the profiler enabled only while one of its steps runs."""
+
+    __slots__ = ("_coro", "_profile")
+
+    def __init__(self, coro, profile: cProfile.Profile):
+        self._coro = coro
+        self._profile = profile
+
+    def send(self, value):
+        self._profile.enable()
+        try:
+            return self._coro.send(value)
+        finally:
+            self._profile.disable()
+
+    def throw(self, *args):
+        self._profile.enable()
+        try:
+            return self._coro.throw(*args)
+        finally:
+            self._profile.disable()
+
+    def close(self):
+        return self._coro.close()
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+
+class CProfileRunner(_TaskTracker):
+    """
+    cProfile with the same start/stop/write interface, enabled only during
+    steps of the request's own tasks — other requests interleaved on the loop
+    during its awaits are not recorded.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._profile = cProfile.Profile()
+
+    def _wrap(self, coro):
+        return _ProfiledCoroutine(coro, self._profile)
+
+    def start(self):
+        self._attach(asyncio.get_running_loop(), asyncio.current_task())
+
+    def stop(self):
+        self._detach()
+
+    def write(self, path: Path):
+        self._profile.dump_stats(str(path))
+
+
+def _prune_output_dir():
+    """Keep only the newest PROFILE_MAX_FILES profiles."""
+    files = sorted(PROFILE_DIR.glob("*.*"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in files[PROFILE_MAX_FILES:]:
+        try:
+            stale.unlink()
+        except OSError:
+            pass
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# ASGI middleware
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware that profiles selected requests end-to-end.
+
+    Usage:
+        if profiler.is_enabled():
+            app.add_middleware(ProfilerMiddleware)
+    """
+
+    def __init__(self, app, paths: set[str] = PROFILE_PATHS):
+        self.app = app
+        self.paths = paths
+        self._counter = itertools.count(1)
+        # Only one profile at a time — cProfile cannot nest and overlapping
+        # samplers would attribute each other's frames.
+        self._busy = threading.Lock()
+
+    def _should_profile(self, scope) -> bool:
+        if PROFILE_SECRET:
+            for name, value in scope.get("headers", []):
+                if name == PROFILE_HEADER:
+                    return hmac.compare_digest(value, PROFILE_SECRET.encode())
+        if PROFILE_SAMPLE_RATE > 0:
+            return next(self._counter) % PROFILE_SAMPLE_RATE == 0
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        if not self._should_profile(scope) or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        if PROFILE_MODE == "cprofile":
+            profiler, suffix = CProfileRunner(), "prof"
+        else:
+            profiler, suffix = StackSampler(), "folded"
+
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await profiler.wrap(self.app(scope, receive, send))
+        finally:
+            profiler.stop()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            try:
+                PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+                slug = scope["path"].strip("/").replace("/", "_")
+                out = PROFILE_DIR / f"{int(time.time() * 1000)}-{slug}.{suffix}"
+                profiler.write(out)
+                _prune_output_dir()
+                print(f"[PROFILE] {scope['path']} {elapsed_ms:.1f}ms -> {out}")
+            except OSError as e:
+                print(f"[PROFILE] Failed to write profile: {e}")
+            finally:
+                self._busy.release()
@@ -0,0 +1,300 @@
+"""
+Multi-profile resume engine.
+
+One deployment can serve several portfolios. Each profile bundles its own
+system prompt, Layer 3 classifier tables and Layer 2 validator lists. They are
+compiled once into a CompiledProfile (frozen, de-duplicated, lowercased
+keyword tables and validator patterns), cached,
+and picked per request by explicit profile ID or by Host header.
+
+Profiles:
+  - The built-in default profile (DEFAULT_PROFILE_ID) is assembled from
+    api/resume_context.py, so existing behaviour is unchanged.
+  - Every `*.json` file in PROFILES_DIR adds (or overrides) a profile:
+
+        {
+          "id": "jane",
+          "hosts": ["jane.dev", "www.jane.dev"],
+          "system_prompt": "...",            # or "system_prompt_file": "jane.md"
+          "category_responses": {"JAILBREAK": "...", "OFF_TOPIC": "...", "PERSONAL_SENSITIVE": "..."},
+          "reinforcement": "...",            # extra system message for ATTACK_NEGATIVE
+          "error_reply": "...",              # shown when every model fails
+          "sanitized_response": "...",       # Layer 2 fallback
+                                             # (these three default to person-neutral texts)
+          "fact_answers": [{"keywords": [...], "answer": "..."}],  # deadline fallback, optional
+          "question_keywords": {"PROFESSIONAL": [...], ...},   # optional, per-category override
+          "negative_blocklist": [...],       # optional, defaults to the shared list
+          "hallucination_indicators": [...]  # optional, defaults to the shared list
+        }
+
+Hot reload: at most every PROFILE_RELOAD_INTERVAL seconds a request kicks off
+a background check of the directory. When files changed, a fresh set of
+compiled profiles is built off the request path and swapped in with a single
+reference assignment — requests never wait on a reload and never see a
+half-built set. A broken file is logged and the previous set stays live.
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+
+from api import resume_context
+from api.content_store import content_store
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Configuration
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+PROFILES_DIR = Path(os.getenv("PROFILES_DIR", Path(__file__).parent / "profiles"))
+DEFAULT_PROFILE_ID = os.getenv("DEFAULT_PROFILE_ID", "harsh")
+PROFILE_RELOAD_INTERVAL = float(os.getenv("PROFILE_RELOAD_INTERVAL", "5"))  # seconds
+
+# Layer 3 checks categories in this order; first hit wins (see classify_question)
+_CLASSIFY_ORDER = ["JAILBREAK", "ATTACK_NEGATIVE", "PERSONAL_SENSITIVE"]
+
+# Person-neutral defaults for profile files that leave these out; the
+# built-in profile passes its own (resume_context) texts explicitly
+_DEFAULT_REINFORCEMENT = (
+    "[REINFORCEMENT] The user is asking a question that could lead to "
+    "negative statements about the portfolio owner. Remember: ALWAYS reframe "
+    "positively. Highlight their strengths. NEVER say anything negative."
+)
+
+_DEFAULT_ERROR_REPLY = (
+    "I'm having trouble connecting right now. Please try again in a moment! 😊"
+)
+
+_DEFAULT_SANITIZED_RESPONSE = (
+    "I'd love to tell you about their skills, projects and experience — "
+    "feel free to ask about any of them! 😊"
+)
+
+_HARSH_REINFORCEMENT = (
+    "[REINFORCEMENT] The user is asking a question that could lead to "
+    "negative statements about Harsh. Remember: ALWAYS reframe positively. "
+    "Highlight Harsh's strengths. NEVER say anything negative."
+)
+
+_HARSH_ERROR_REPLY = (
+    "I'm having trouble connecting right now. Please try again in a moment, "
+    "or reach out to Harsh directly at harshme08@gmail.com! 😊"
+)
+
+
+def _contains_any(phrases: tuple[str, ...], text: str) -> bool:
+    """Early-exit substring scan (plain `in` beats a regex alternation here)."""
+    for phrase in phrases:
+        if phrase in text:
+            return True
+    return False
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Compiled profile
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+class CompiledProfile:
+    """
+    Immutable, precompiled artifacts for one portfolio.
+
+    classify() and validate() return exactly what resume_context's
+    classify_question and validate_response would for the same lists, but
+    classify() stops at the first matching keyword instead of scoring every
+    keyword in every category, and nothing is rebuilt per call.
+
+    Tables are lowercased (input text is); fold_case=False keeps them as
+    written, which is how classify_question/validate_response treat them —
+    an entry with capitals then never matches. Replay uses that for rule
+    versions taken from resume_context.
+    """
+
+    def __init__(self, profile_id: str, data: dict, fold_case: bool = True):
+        self.id = profile_id
+        self.hosts = [h.lower() for h in data.get("hosts", [])]
+        self.system_prompt = data["system_prompt"]
+        self.category_responses = dict(data["category_responses"])
+        self.reinforcement = data.get("reinforcement", _DEFAULT_REINFORCEMENT)
+        self.error_reply = data.get("error_reply", _DEFAULT_ERROR_REPLY)
+        self.sanitized_response = data.get("sanitized_response", _DEFAULT_SANITIZED_RESPONSE)
+
+        keywords = {
+            name: category["keywords"]
+            for name, category in resume_context.QUESTION_CATEGORIES.items()
+        }
+        keywords.update(data.get("question_keywords", {}))
+        # Input text is lowercased before matching, so the tables must be too
+        fold = str.lower if fold_case else str
+        self._keywords = {
+            name: tuple(dict.fromkeys(fold(kw) for kw in kws)) for name, kws in keywords.items()
+        }
+
+        self._negative = tuple(
+            fold(p) for p in data.get("negative_blocklist", resume_context.NEGATIVE_BLOCKLIST)
+        )
+        self._hallucination = tuple(
+            fold(p)
+            for p in data.get("hallucination_indicators", resume_context.HALLUCINATION_INDICATORS)
+        )
+        self._leakage = tuple((p, p.lower()) for p in resume_context.LEAKAGE_PATTERNS)
+        self._fact_answers = tuple(
+            (tuple(kw.lower() for kw in entry["keywords"]), entry["answer"])
+            for entry in data.get("fact_answers", ())
+        )
+
+    def _hit(self, category: str, text: str) -> bool:
+        return _contains_any(self._keywords.get(category, ()), text)
+
+    def classify(self, question: str) -> str:
+        """Layer 3 for this profile — same priority rules as classify_question."""
+        q_lower = question.lower().strip()
+        for category in _CLASSIFY_ORDER:
+            if self._hit(category, q_lower):
+                return category
+        if self._hit("OFF_TOPIC", q_lower) and not self._hit("PROFESSIONAL", q_lower):
+            return "OFF_TOPIC"
+        return "PROFESSIONAL"
+
+    def validate(self, response_text: str) -> dict:
+        """Layer 2 for this profile — same result shape as validate_response."""
+        response_lower = response_text.lower()
+        issues = []
+
+        for phrase in self._negative:
+            if phrase in response_lower:
+                issues.append(f"NEGATIVE_LANGUAGE: '{phrase}'")
+        for indicator in self._hallucination:
+            if indicator in response_lower:
+                issues.append(f"POSSIBLE_HALLUCINATION: '{indicator}'")
+        for pattern, pattern_lower in self._leakage:
+            if pattern_lower in response_lower:
+                issues.append(f"PROMPT_LEAKAGE: '{pattern}'")
+
+        is_safe = not issues
+        return {
+            "is_safe": is_safe,
+            "issues": issues,
+            "sanitized_response": response_text if is_safe else self.sanitized_response,
+        }
+
+    def fact_answer(self, question: str) -> str | None:
+        """A canned answer from the profile's facts, or None (deadline fallback)."""
+        q_lower = question.lower()
+        for keywords, answer in self._fact_answers:
+            if _contains_any(keywords, q_lower):
+                return answer
+        return None
+
+
+def _builtin_profile_data() -> dict:
+    return {
+        "system_prompt": resume_context.RESUME_SYSTEM_PROMPT,
+        "category_responses": resume_context.CATEGORY_RESPONSES,
+        "reinforcement": _HARSH_REINFORCEMENT,
+        "error_reply": _HARSH_ERROR_REPLY,
+        "sanitized_response": resume_context.SANITIZED_RESPONSE,
+        "fact_answers": resume_context.FACT_ANSWERS,
+    }
+
+
+def _load_profile_file(path: Path) -> tuple[str, dict]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if "system_prompt_file" in data and "system_prompt" not in data:
+        data["system_prompt"] = (path.parent / data["system_prompt_file"]).read_text(encoding="utf-8")
+    profile_id = data.get("id") or path.stem
+    missing = {"system_prompt", "category_responses"} - data.keys()
+    if missing:
+        raise ValueError(f"{path.name}: missing {sorted(missing)}")
+    return profile_id, data
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Registry with atomic hot reload
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+class ProfileRegistry:
+    """
+    Holds the live set of compiled profiles as one immutable snapshot
+    ({id: profile}, {host: id}). Readers take the reference; reloads replace it.
+    """
+
+    def __init__(self, directory: Path = PROFILES_DIR, default_id: str = DEFAULT_PROFILE_ID):
+        self.directory = directory
+        self.default_id = default_id
+        self._reload_lock = threading.Lock()
+        self._last_check = time.monotonic()
+        self._fingerprint = self._compute_fingerprint()
+        try:
+            self._snapshot = self._build()
+        except Exception as e:
+            # A broken profile file must not take the API down at boot
+            print(f"[PROFILES] Failed to load {self.directory}, serving built-in profile only: {e}")
+            self._snapshot = self._build(include_files=False)
+
+    def _compute_fingerprint(self) -> tuple:
+        if not self.directory.is_dir():
+            return ()
+        return tuple(sorted(
+            (p.name, p.stat().st_mtime_ns, p.stat().st_size)
+            for p in self.directory.iterdir() if p.is_file()
+        ))
+
+    def _build(self, include_files: bool = True) -> tuple[dict, dict]:
+        profiles = {self.default_id: CompiledProfile(self.default_id, _builtin_profile_data())}
+        if include_files and self.directory.is_dir():
+            for path in sorted(self.directory.glob("*.json")):
+                profile_id, data = _load_profile_file(path)
+                profiles[profile_id] = CompiledProfile(profile_id, data)
+        hosts = {host: p.id for p in profiles.values() for host in p.hosts}
+        # Canned replies are stored once and referenced (compact storage mode)
+        content_store.register_shared(
+            text
+            for p in profiles.values()
+            for text in (*p.category_responses.values(), p.sanitized_response, p.error_reply)
+        )
+        return profiles, hosts
+
+    def _reload_worker(self):
+        try:
+            fingerprint = self._compute_fingerprint()
+            if fingerprint != self._fingerprint:
+                snapshot = self._build()
+                self._snapshot = snapshot          # atomic swap
+                self._fingerprint = fingerprint
+                print(f"[PROFILES] Reloaded: {sorted(snapshot[0])}")
+        except Exception as e:
+            # Keep serving the previous profiles; retry on the next change
+            print(f"[PROFILES] Reload failed, keeping previous set: {e}")
+        finally:
+            self._reload_lock.release()
+
+    def maybe_reload(self):
+        """Start a background reload check if the interval elapsed. Never blocks."""
+        now = time.monotonic()
+        if now - self._last_check < PROFILE_RELOAD_INTERVAL:
+            return
+        self._last_check = now
+        if self._reload_lock.acquire(blocking=False):
+            threading.Thread(target=self._reload_worker, name="profile-reload", daemon=True).start()
+
+    def get(self, profile_id: str | None = None, host: str | None = None) -> CompiledProfile:
+        """Pick a profile by explicit ID, then by Host, then the default."""
+        self.maybe_reload()
+        profiles, hosts = self._snapshot
+        if profile_id and profile_id in profiles:
+            return profiles[profile_id]
+        if host:
+            mapped = hosts.get(host.split(":")[0].lower())
+            if mapped:
+                return profiles[mapped]
+        return profiles[self.default_id]
+
+    def get_stats(self) -> dict:
+        profiles, hosts = self._snapshot
+        return {"profiles": sorted(profiles), "hosts": len(hosts)}
+
+
+# Singleton instance
+profile_registry = ProfileRegistry()
@@ -0,0 +1,210 @@
+"""
+LLM provider backends for the model race.
+
+A Provider is one OpenAI-compatible chat-completions endpoint: its own URL,
+auth, model list, connection pool and stats. get_chat_response races every
+(provider, model) pair at once, so a self-hosted server on the LAN
+(llama.cpp / vLLM / Ollama's OpenAI API) competes with OpenRouter and each
+one is the other's fallback.
+
+Providers are configured from the environment (see openrouter_service):
+  - OpenRouter: OPENROUTER_API_KEY + the free model list
+  - Local:      LOCAL_LLM_URL, LOCAL_LLM_MODELS (comma-separated),
+                optional LOCAL_LLM_API_KEY, LOCAL_LLM_TIMEOUT
+
+Every admitted turn sends one request per model, so each pool is sized for
+len(models) × ADMISSION_MAX_LIMIT concurrent requests unless
+PROVIDER_MAX_CONNECTIONS says otherwise. If the pool is still exhausted, a
+request gives up after PROVIDER_POOL_TIMEOUT instead of queueing for the
+full request timeout.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import time
+import asyncio
+from typing import TYPE_CHECKING
+
+from api.admission import ADMISSION_MAX_LIMIT
+from api.generation_budget import output_tracker
+
+# httpx is imported on first use to keep serverless cold starts short
+if TYPE_CHECKING:
+    import httpx
+
+
+# Per-provider connection cap; 0 = len(models) × ADMISSION_MAX_LIMIT
+PROVIDER_MAX_CONNECTIONS = int(os.getenv("PROVIDER_MAX_CONNECTIONS", "0"))
+# Seconds to wait for a free pooled connection
+PROVIDER_POOL_TIMEOUT = float(os.getenv("PROVIDER_POOL_TIMEOUT", "1.0"))
+
+
+def clean_response(text: str) -> str:
+    """Strip <think>...</think> blocks from reasoning model outputs."""
+    if not text:
+        return ""
+    cleaned = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
+    return cleaned if cleaned else text.strip()
+
+
+class Provider:
+    """
+    One OpenAI-compatible backend with a persistent connection pool.
+
+    The httpx client is created lazily and re-created if the running event
+    loop changes (e.g. a fresh loop per serverless invocation), so pooled
+    connections are reused across turns without leaking across loops.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        api_url: str,
+        models: list[str],
+        api_key: str = "",
+        extra_headers: dict | None = None,
+        timeout: float = 20.0,
+        max_connections: int = PROVIDER_MAX_CONNECTIONS,
+        pool_timeout: float = PROVIDER_POOL_TIMEOUT,
+        supports_reasoning: bool = False,
+    ):
+        self.name = name
+        self.api_url = api_url
+        self.models = list(models)
+        self.timeout = timeout
+        self.max_connections = max_connections or len(self.models) * ADMISSION_MAX_LIMIT
+        self.pool_timeout = pool_timeout
+        # Only OpenRouter understands the unified `reasoning` parameter
+        self.supports_reasoning = supports_reasoning
+
+        self.headers = {"Content-Type": "application/json", **(extra_headers or {})}
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+
+        self._client: httpx.AsyncClient | None = None
+        self._client_loop: asyncio.AbstractEventLoop | None = None
+
+        self._stats = {
+            "requests": 0, "successes": 0, "failures": 0, "timeouts": 0, "pool_timeouts": 0, "wins": 0,
+        }
+        self._latency_ewma: float | None = None
+
+    def label(self, model: str) -> str:
+        """model_used label; OpenRouter keeps the bare model ID as before."""
+        return model if self.name == "openrouter" else f"{self.name}:{model}"
+
+    def _get_client(self) -> httpx.AsyncClient:
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, pool=self.pool_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self):
+        # A client bound to another (finished) loop can't be closed from here
+        if (
+            self._client is not None
+            and not self._client.is_closed
+            and self._client_loop is asyncio.get_running_loop()
+        ):
+            await self._client.aclose()
+        self._client = None
+
+    def record_win(self):
+        self._stats["wins"] += 1
+
+    async def complete(
+        self,
+        model: str,
+        messages: list[dict],
+        generation: dict,
+        temperature: float,
+    ) -> dict | None:
+        """
+        Try a single model. Returns the parsed result dict on success, or None on failure.
+        `generation` holds the budget fields (max_tokens, optional reasoning settings).
+        """
+        import httpx
+
+        if not self.supports_reasoning and "reasoning" in generation:
+            generation = {k: v for k, v in generation.items() if k != "reasoning"}
+
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            **generation,
+        }
+        self._stats["requests"] += 1
+        started = time.monotonic()
+        try:
+            response = await self._get_client().post(
+                self.api_url,
+                headers=self.headers,
+                json=payload,
+            )
+
+            if response.status_code == 200:
+                data = response.json()
+                choice = data.get("choices", [{}])[0]
+                raw_content = choice.get("message", {}).get("content", "")
+                content = clean_response(raw_content)
+
+                # Track output length so generation budgets can adapt per model;
+                # reasoning tokens don't count, only the visible answer
+                usage = data.get("usage") or {}
+                completion_tokens = usage.get("completion_tokens")
+                if completion_tokens is None:
+                    completion_tokens = len(content) // 4  # rough chars→tokens
+                else:
+                    details = usage.get("completion_tokens_details") or {}
+                    completion_tokens = max(completion_tokens - (details.get("reasoning_tokens") or 0), 0)
+                output_tracker.record(
+                    self.label(model), completion_tokens, choice.get("finish_reason") == "length"
+                )
+
+                if content:
+                    self._stats["successes"] += 1
+                    self._observe_latency(time.monotonic() - started)
+                    return {"content": content, "model_used": self.label(model)}
+
+            # Log non-200 for debugging
+            if response.status_code != 200:
+                print(f"[{response.status_code}] {self.label(model)}")
+
+        except httpx.PoolTimeout:
+            self._stats["pool_timeouts"] += 1
+            print(f"[POOL TIMEOUT] {self.label(model)} — all {self.max_connections} connections busy")
+        except httpx.TimeoutException:
+            self._stats["timeouts"] += 1
+            print(f"[TIMEOUT] {self.label(model)}")
+        except Exception as e:
+            print(f"[ERROR] {self.label(model)}: {e}")
+
+        self._stats["failures"] += 1
+        return None
+
+    def _observe_latency(self, seconds: float):
+        if self._latency_ewma is None:
+            self._latency_ewma = seconds
+        else:
+            self._latency_ewma += 0.2 * (seconds - self._latency_ewma)
+
+    def get_stats(self) -> dict:
+        """Return provider stats (for health check)."""
+        return {
+            "models": len(self.models),
+            "max_connections": self.max_connections,
+            **self._stats,
+            "latency_ewma_s": round(self._latency_ewma, 2) if self._latency_ewma else None,
+        }
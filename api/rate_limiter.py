@@ -7,13 +7,14 @@ Tracks requests per IP address with automatic expired-entry cleanup.
 Limits:
   - /api/chat:    10 requests per 60 seconds per IP
   - /api/chat/history: 30 requests per 60 seconds per IP
+  - /api/admin/export: 5 requests per 60 seconds per IP
   - Global:       100 requests per 60 seconds per IP (across all endpoints)
 """
 
 import time
 import threading
 from collections import defaultdict
-from fastapi import Request, HTTPException
+from fastapi.requests import HTTPConnection
 
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -24,6 +25,7 @@ RATE_LIMITS = {
     # endpoint_key: (max_requests, window_seconds)
     "chat": (10, 60),         # 10 chat messages per minute
     "history": (30, 60),      # 30 history fetches per minute
+    "export": (5, 60),        # 5 admin exports per minute
     "global": (100, 60),      # 100 total requests per minute across all endpoints
 }
 
@@ -139,10 +141,11 @@ rate_limiter = SlidingWindowRateLimiter()
 # Helper to extract client IP
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
-def get_client_ip(request: Request) -> str:
+def get_client_ip(request: HTTPConnection) -> str:
     """
     Extract the real client IP, accounting for proxies/load balancers.
     Checks common proxy headers before falling back to the direct connection IP.
+    Works for both HTTP requests and WebSocket connections.
     """
     # Vercel / Cloudflare / common proxy headers
     forwarded_for = request.headers.get("x-forwarded-for")
@@ -166,45 +169,21 @@ def get_client_ip(request: Request) -> str:
 
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-# FastAPI dependency — plug into any endpoint
+# Limit check — used by the edge pre-filter and the WebSocket
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
-def check_rate_limit(endpoint: str):
+def check_limits(client_ip: str, endpoint: str) -> dict | None:
     """
-    Returns a FastAPI dependency that enforces rate limiting for the given endpoint.
-    
-    Usage:
-        @app.post("/api/chat", dependencies=[Depends(check_rate_limit("chat"))])
+    Apply the endpoint-specific limit, then the global limit.
+    Returns the first failing result (with a "scope" key), or None if allowed.
     """
-    def _dependency(request: Request):
-        client_ip = get_client_ip(request)
-
-        # Check endpoint-specific limit
-        result = rate_limiter.is_allowed(client_ip, endpoint)
-        if not result["allowed"]:
-            print(f"[RATE LIMIT] {client_ip} hit {endpoint} limit — retry in {result['retry_after']}s")
-            raise HTTPException(
-                status_code=429,
-                detail={
-                    "error": "Too many requests. Please slow down.",
-                    "retry_after": result["retry_after"],
-                    "limit": result["limit"],
-                },
-                headers={"Retry-After": str(int(result["retry_after"]))},
-            )
-
-        # Check global limit
-        global_result = rate_limiter.is_allowed(client_ip, "global")
-        if not global_result["allowed"]:
-            print(f"[RATE LIMIT] {client_ip} hit global limit — retry in {global_result['retry_after']}s")
-            raise HTTPException(
-                status_code=429,
-                detail={
-                    "error": "Too many requests. Please slow down.",
-                    "retry_after": global_result["retry_after"],
-                    "limit": global_result["limit"],
-                },
-                headers={"Retry-After": str(int(global_result["retry_after"]))},
-            )
-
-    return _dependency
+    result = rate_limiter.is_allowed(client_ip, endpoint)
+    if not result["allowed"]:
+        return {**result, "scope": endpoint}
+
+    global_result = rate_limiter.is_allowed(client_ip, "global")
+    if not global_result["allowed"]:
+        return {**global_result, "scope": "global"}
+
+    return None
+
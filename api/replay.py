@@ -0,0 +1,277 @@
+"""
+Offline replay of stored chat traffic through the defense pipeline.
+
+Answers "what does this rule change do to real traffic?" before it ships:
+every stored user message is re-classified (Layer 3) and every stored model
+reply is re-validated (Layer 2) under two rule versions, and the differences
+are counted.
+
+A rule version is resolved to profile data and compiled into a
+CompiledProfile, whose classify()/validate() match classify_question and
+validate_response for the same tables:
+
+  - "current"      api/resume_context.py as imported
+  - "git:<rev>"    api/resume_context.py at a git revision (e.g. git:HEAD~1)
+  - "<file>.py"    any module defining QUESTION_CATEGORIES / NEGATIVE_BLOCKLIST /
+                   HALLUCINATION_INDICATORS (plus the prompt and presets)
+  - "<file>.json"  a profile file (see api/profiles.py)
+
+Module versions are compiled as written (no case folding), the way
+classify_question and validate_response use them, so an entry with capitals
+never matches there and is listed under "warnings" in the report. Profile
+files are folded to lowercase, as the live service compiles them.
+
+Rows are read in keyset pages by the parent process and fanned out to a
+process pool, with a bounded number of pages in flight so memory stays flat
+on tables of any size.
+
+Only rows whose stored content is what the rules originally saw are
+replayed: replies stored as preset, error, fallback or "|sanitized" have no
+original model output to re-validate and are counted as skipped.
+"""
+
+import os
+import subprocess
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from sqlalchemy import select
+
+from api.database import ChatMessage, get_engine, init_db
+
+REPLAY_PAGE_SIZE = 5000
+REPLAY_EXAMPLES = 5          # example message IDs kept per change
+RULES_MODULE_PATH = "api/resume_context.py"
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Rule versions
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+def _profile_data_from_module(namespace: dict) -> dict:
+    return {
+        "system_prompt": namespace["RESUME_SYSTEM_PROMPT"],
+        "category_responses": namespace["CATEGORY_RESPONSES"],
+        "sanitized_response": namespace.get("SANITIZED_RESPONSE", ""),
+        "question_keywords": {
+            name: category["keywords"] for name, category in namespace["QUESTION_CATEGORIES"].items()
+        },
+        "negative_blocklist": namespace["NEGATIVE_BLOCKLIST"],
+        "hallucination_indicators": namespace["HALLUCINATION_INDICATORS"],
+    }
+
+
+def _exec_rules_source(source: str, origin: str) -> dict:
+    namespace = {"__name__": f"replay_rules_{abs(hash(origin))}"}
+    exec(compile(source, origin, "exec"), namespace)
+    return _profile_data_from_module(namespace)
+
+
+def _folds_case(spec: str) -> bool:
+    return Path(spec).suffix == ".json"
+
+
+def _mixed_case_entries(rules: dict) -> list[str]:
+    """Table entries with capitals; they cannot match lowercased input unless folded."""
+    tables = [(f"question_keywords.{name}", kws) for name, kws in rules["question_keywords"].items()]
+    tables += [
+        ("negative_blocklist", rules["negative_blocklist"]),
+        ("hallucination_indicators", rules["hallucination_indicators"]),
+    ]
+    return [
+        f"never matches (mixed case): {table} '{entry}'"
+        for table, entries in tables for entry in entries if entry != entry.lower()
+    ]
+
+
+def load_rules(spec: str) -> dict:
+    """Resolve a rule version spec to profile data (see module docstring)."""
+    if spec == "current":
+        from api import resume_context
+        return _profile_data_from_module(vars(resume_context))
+    if spec.startswith("git:"):
+        rev = spec[len("git:"):]
+        source = subprocess.run(
+            ["git", "show", f"{rev}:{RULES_MODULE_PATH}"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent.parent,
+        ).stdout
+        return _exec_rules_source(source, spec)
+    path = Path(spec)
+    if path.suffix == ".json":
+        from api.profiles import _load_profile_file
+        return _load_profile_file(path)[1]
+    return _exec_rules_source(path.read_text(encoding="utf-8"), str(path))
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Worker side
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+_worker_profiles = None
+
+
+def _init_worker(baseline: dict, candidate: dict, fold_baseline: bool, fold_candidate: bool):
+    global _worker_profiles
+    from api.profiles import CompiledProfile
+    _worker_profiles = (
+        CompiledProfile("baseline", baseline, fold_case=fold_baseline),
+        CompiledProfile("candidate", candidate, fold_case=fold_candidate),
+    )
+
+
+def _is_replayable_reply(model_used: str | None) -> bool:
+    return (
+        bool(model_used)
+        and not model_used.startswith(("preset:", "fallback:"))
+        and not model_used.endswith("|sanitized")
+    )
+
+
+def _empty_result() -> dict:
+    return {
+        "user": 0, "replies": 0, "skipped": 0,
+        "baseline_categories": Counter(), "candidate_categories": Counter(),
+        "category_changes": Counter(), "sanitization_changes": Counter(),
+        "baseline_flagged": 0, "candidate_flagged": 0,
+        "new_issues": Counter(), "examples": {},
+    }
+
+
+def _replay_page(rows: list[tuple]) -> dict:
+    """Replay one page of (id, role, content, model_used) rows under both versions."""
+    baseline, candidate = _worker_profiles
+    result = _empty_result()
+    examples = result["examples"]
+
+    for message_id, role, content, model_used in rows:
+        if role == "user":
+            result["user"] += 1
+            before, after = baseline.classify(content), candidate.classify(content)
+            result["baseline_categories"][before] += 1
+            result["candidate_categories"][after] += 1
+            if before != after:
+                change = f"{before} -> {after}"
+                result["category_changes"][change] += 1
+                examples.setdefault(change, [])
+                if len(examples[change]) < REPLAY_EXAMPLES:
+                    examples[change].append(message_id)
+        elif _is_replayable_reply(model_used):
+            result["replies"] += 1
+            before, after = baseline.validate(content), candidate.validate(content)
+            result["baseline_flagged"] += not before["is_safe"]
+            result["candidate_flagged"] += not after["is_safe"]
+            if before["is_safe"] != after["is_safe"]:
+                change = "newly sanitized" if before["is_safe"] else "no longer sanitized"
+                result["sanitization_changes"][change] += 1
+                examples.setdefault(change, [])
+                if len(examples[change]) < REPLAY_EXAMPLES:
+                    examples[change].append(message_id)
+            for issue in set(after["issues"]) - set(before["issues"]):
+                result["new_issues"][issue] += 1
+        else:
+            result["skipped"] += 1
+    return result
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Parent side
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+def _iter_pages(page_size: int, limit: int | None):
+    """Keyset pages of (id, role, content, model_used), each an independent short read."""
+    table = ChatMessage.__table__
+    engine = get_engine()
+    last_id, remaining = "", limit
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(table.c.id, table.c.role, table.c.content, table.c.model_used)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(size)
+            ).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        if remaining is not None:
+            remaining -= len(rows)
+        yield [tuple(row) for row in rows]
+
+
+def _merge(total: dict, part: dict):
+    for key, value in part.items():
+        if key == "examples":
+            for change, ids in value.items():
+                kept = total["examples"].setdefault(change, [])
+                kept.extend(ids[:REPLAY_EXAMPLES - len(kept)])
+        else:
+            total[key] += value
+
+
+def replay(
+    baseline: str = "git:HEAD",
+    candidate: str = "current",
+    workers: int | None = None,
+    page_size: int = REPLAY_PAGE_SIZE,
+    limit: int | None = None,
+) -> dict:
+    """
+    Replay stored messages under two rule versions and report the differences.
+
+    Returns a JSON-ready report: per-version category counts, category and
+    sanitization transitions (with example message IDs), issues only the
+    candidate raises, and throughput.
+    """
+    started = time.perf_counter()
+    init_db()
+    workers = workers or os.cpu_count() or 1
+    rules = (load_rules(baseline), load_rules(candidate))
+    folds = (_folds_case(baseline), _folds_case(candidate))
+    warnings = {
+        name: entries
+        for name, data, fold in zip(("baseline", "candidate"), rules, folds)
+        if not fold and (entries := _mixed_case_entries(data))
+    }
+
+    total = _empty_result()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=rules + folds) as pool:
+        in_flight = set()
+        for page in _iter_pages(page_size, limit):
+            in_flight.add(pool.submit(_replay_page, page))
+            if len(in_flight) >= workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _merge(total, future.result())
+        for future in in_flight:
+            _merge(total, future.result())
+
+    elapsed = time.perf_counter() - started
+    messages = total["user"] + total["replies"] + total["skipped"]
+    return {
+        "baseline": baseline,
+        "candidate": candidate,
+        "messages": messages,
+        "user_messages": total["user"],
+        "replies_validated": total["replies"],
+        "replies_skipped": total["skipped"],
+        "categories": {
+            "baseline": dict(total["baseline_categories"].most_common()),
+            "candidate": dict(total["candidate_categories"].most_common()),
+        },
+        "category_changes": dict(total["category_changes"].most_common()),
+        "sanitization": {
+            "baseline_flagged": total["baseline_flagged"],
+            "candidate_flagged": total["candidate_flagged"],
+            **dict(total["sanitization_changes"]),
+        },
+        "new_issues": dict(total["new_issues"].most_common(20)),
+        "examples": total["examples"],
+        "warnings": warnings,
+        "workers": workers,
+        "duration_s": round(elapsed, 2),
+        "messages_per_s": round(messages / elapsed) if elapsed else None,
+    }
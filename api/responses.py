@@ -0,0 +1,27 @@
+"""
+Fast JSON responses for the Portfolio API.
+
+Endpoints that return a FastJSONResponse skip FastAPI's second pass (building
+and validating `response_model` instances, then jsonable_encoder). Rows go
+straight from the DB into plain dicts and out through orjson. If orjson is not
+installed, the stdlib encoder is used with the same output.
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover — optional speedup
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -221,7 +221,7 @@ QUESTION_CATEGORIES = {
         "keywords": [
             "ignore previous", "ignore above", "disregard", "forget instructions",
             "system prompt", "reveal prompt", "show prompt", "repeat instructions",
-            "pretend you", "act as", "you are now", "DAN", "jailbreak",
+            "pretend you", "act as", "you are now", "dan mode", "do anything now", "jailbreak",
             "unrestricted", "no restrictions", "bypass", "override",
             "new persona", "developer mode", "sudo", "admin mode",
             "base64", "decode this", "translate from",
@@ -320,6 +320,46 @@ CATEGORY_RESPONSES = {
 }
 
 
+# Answers built straight from HARSH_FACTS — served when the models can't reply
+# within the request deadline. First entry whose keywords match wins.
+FACT_ANSWERS = [
+    {
+        "keywords": ["skill", "tech stack", "technolog", "language", "framework", "tools"],
+        "answer": (
+            f"Harsh works across the stack — frontend: {', '.join(HARSH_FACTS['skills_frontend'])}; "
+            f"backend: {', '.join(HARSH_FACTS['skills_backend'])}; "
+            f"languages: {', '.join(HARSH_FACTS['skills_languages'])}. 🚀"
+        ),
+    },
+    {
+        "keywords": ["project", "built", "portfolio", "made"],
+        "answer": (
+            f"Harsh has built projects including {', '.join(HARSH_FACTS['projects'])}. "
+            "Ask me about any of them! 😊"
+        ),
+    },
+    {
+        "keywords": ["experience", "intern", "work", "job", "company", "companies"],
+        "answer": "Harsh's experience: " + "; ".join(HARSH_FACTS["work_experience"]) + ".",
+    },
+    {
+        "keywords": ["education", "college", "degree", "study", "university", "b.tech"],
+        "answer": f"Harsh is pursuing a {HARSH_FACTS['education']}.",
+    },
+    {
+        "keywords": ["achievement", "award", "scholar", "accomplish"],
+        "answer": "Harsh's achievements: " + "; ".join(HARSH_FACTS["achievements"]) + ". 🏆",
+    },
+    {
+        "keywords": ["contact", "email", "reach", "hire", "linkedin", "github"],
+        "answer": (
+            f"You can reach Harsh at {HARSH_FACTS['email']}, on LinkedIn ({HARSH_FACTS['linkedin']}) "
+            f"or GitHub ({HARSH_FACTS['github']}). 😊"
+        ),
+    },
+]
+
+
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 # LAYER 2 — POST-RESPONSE VALIDATION
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -362,6 +402,21 @@ _all_skills.extend(HARSH_FACTS["skills_ai"])
 VALID_SKILLS = [s.lower() for s in _all_skills]
 VALID_PROJECTS = [p.lower() for p in HARSH_FACTS["projects"]]
 
+# Prompt section names that must never be echoed back to the user
+LEAKAGE_PATTERNS = [
+    "SYSTEM_IDENTITY", "CORE_RULES", "RESUME_DATA", "HALLUCINATION_PREVENTION",
+    "POSITIVE_REFRAME", "JAILBREAK_DEFENSE", "FINAL_REMINDER", "OFF_TOPIC_HANDLING",
+    "RESPONSE_FORMAT", "<system", "</system", "priority=\"ABSOLUTE\"",
+]
+
+# Safe fallback returned in place of a response that fails validation
+SANITIZED_RESPONSE = (
+    "Harsh is a talented full-stack developer with hands-on production experience "
+    "at companies like Miracle AI and Vaxalor AI, a strong portfolio of 9+ projects, "
+    "and recognition as a Reliance Foundation Scholar. "
+    "Feel free to ask me about his specific skills, projects, or experience! 😊"
+)
+
 
 def validate_response(response_text: str) -> dict:
     """
@@ -395,28 +450,15 @@ def validate_response(response_text: str) -> dict:
             issues.append(f"POSSIBLE_HALLUCINATION: '{indicator}'")
 
     # ── Check 3: System prompt leakage ──────────────────────────────────────
-    leakage_patterns = [
-        "SYSTEM_IDENTITY", "CORE_RULES", "RESUME_DATA", "HALLUCINATION_PREVENTION",
-        "POSITIVE_REFRAME", "JAILBREAK_DEFENSE", "FINAL_REMINDER", "OFF_TOPIC_HANDLING",
-        "RESPONSE_FORMAT", "<system", "</system", "priority=\"ABSOLUTE\"",
-    ]
-    for pattern in leakage_patterns:
+    for pattern in LEAKAGE_PATTERNS:
         if pattern.lower() in response_lower:
             issues.append(f"PROMPT_LEAKAGE: '{pattern}'")
 
     # ── Determine safety ────────────────────────────────────────────────────
     is_safe = len(issues) == 0
 
-    # Build a sanitized fallback response
-    sanitized_response = (
-        "Harsh is a talented full-stack developer with hands-on production experience "
-        "at companies like Miracle AI and Vaxalor AI, a strong portfolio of 9+ projects, "
-        "and recognition as a Reliance Foundation Scholar. "
-        "Feel free to ask me about his specific skills, projects, or experience! 😊"
-    )
-
     return {
         "is_safe": is_safe,
         "issues": issues,
-        "sanitized_response": sanitized_response if not is_safe else response_text,
+        "sanitized_response": SANITIZED_RESPONSE if not is_safe else response_text,
     }
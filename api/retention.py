@@ -0,0 +1,287 @@
+"""
+Retention, archival and compaction for the chat_messages table.
+
+Every bot probe and jailbreak attempt leaves rows behind, so the table (and the
+SQLite file) would otherwise grow forever. This module:
+
+  1. Picks expired rows using per-`model_used` TTLs (first matching policy wins;
+     rows matching no policy use the default TTL). A user message has no
+     model_used of its own: it is judged by the reply that follows it, so a
+     jailbreak probe expires together with its preset reply and archived
+     sessions keep whole turns.
+  2. Archives them to gzip-compressed JSONL, one batch at a time.
+  3. Deletes each archived batch in its own short transaction, pausing between
+     batches so the live chat endpoints never wait long on the write lock.
+  4. Runs an incremental VACUUM (SQLite) and reports the bytes reclaimed.
+
+Configuration:
+  RETENTION_POLICIES     — "pattern=days,..." on model_used, '*' wildcard
+                           (default: "preset:*=7,*|sanitized=30,none=30")
+  RETENTION_DEFAULT_DAYS — TTL for everything else, 0 = keep forever (default 90)
+  RETENTION_ARCHIVE_DIR  — where archives are written (default ./archive)
+
+Run with `python -m scripts.retention` (see --help).
+"""
+
+import os
+import gzip
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import and_, case, delete, exists, func, not_, select, text
+from sqlalchemy.orm import aliased
+
+from api.database import ChatMessage, get_engine, init_db
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Configuration
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+def _parse_policies(spec: str) -> list[tuple[str, int]]:
+    policies = []
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        pattern, days = item.rsplit("=", 1)
+        policies.append((pattern.strip(), int(days)))
+    return policies
+
+
+RETENTION_POLICIES = _parse_policies(
+    os.getenv("RETENTION_POLICIES", "preset:*=7,*|sanitized=30,none=30")
+)
+RETENTION_DEFAULT_DAYS = int(os.getenv("RETENTION_DEFAULT_DAYS", "90"))
+RETENTION_ARCHIVE_DIR = Path(os.getenv("RETENTION_ARCHIVE_DIR", "./archive"))
+
+# Rows per delete transaction, and the pause between transactions
+RETENTION_BATCH_SIZE = 500
+RETENTION_BATCH_PAUSE = 0.05  # seconds
+
+# Pages released per `PRAGMA incremental_vacuum` call
+VACUUM_CHUNK_PAGES = 1000
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Policy → SQL
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+_reply = aliased(ChatMessage)
+
+# The assistant reply a user row belongs to: the session's next assistant row
+_next_reply = and_(
+    _reply.session_id == ChatMessage.session_id,
+    _reply.role == "assistant",
+    _reply.created_at >= ChatMessage.created_at,
+)
+
+
+def _turn_model_used():
+    """model_used of the row's turn — its own for replies, its reply's for user rows."""
+    next_model_used = (
+        select(_reply.model_used).where(_next_reply).order_by(_reply.created_at).limit(1).scalar_subquery()
+    )
+    return case((ChatMessage.role == "assistant", ChatMessage.model_used), else_=next_model_used)
+
+
+def _turn_answered():
+    """False only for user rows with no reply after them (never answered, or still in flight)."""
+    return (ChatMessage.role == "assistant") | exists(select(_reply.id).where(_next_reply))
+
+
+def _pattern_like(column, pattern: str):
+    escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    # coalesce so NULLs compare as '' and NOT(...) never evaluates to NULL
+    return func.coalesce(column, "").like(escaped.replace("*", "%"), escape="\\")
+
+
+def row_model_used_matches(pattern: str):
+    """
+    SQL condition for a pattern on the row's own model_used ('none' matches
+    NULL-model assistant rows, e.g. error replies). Used by the export.
+    """
+    if pattern == "none":
+        return and_(ChatMessage.model_used.is_(None), ChatMessage.role == "assistant")
+    return _pattern_like(ChatMessage.model_used, pattern)
+
+
+def model_used_matches(pattern: str):
+    """
+    SQL condition for a policy pattern on the row's turn ('none' matches a NULL
+    model_used reply, e.g. error replies). User rows follow their reply.
+    """
+    turn_model_used = _turn_model_used()
+    if pattern == "none":
+        return and_(turn_model_used.is_(None), _turn_answered())
+    return _pattern_like(turn_model_used, pattern)
+
+
+def _expiry_conditions(policies: list[tuple[str, int]], default_days: int, now: datetime):
+    """
+    Yield (label, condition) pairs, one per policy plus the default.
+    Each condition excludes rows claimed by earlier policies.
+    """
+    claimed = []
+    for pattern, days in policies:
+        match = model_used_matches(pattern)
+        if days > 0:
+            cutoff = now - timedelta(days=days)
+            yield pattern, and_(match, ChatMessage.created_at < cutoff, *[not_(c) for c in claimed])
+        claimed.append(match)
+
+    if default_days > 0:
+        cutoff = now - timedelta(days=default_days)
+        yield "default", and_(ChatMessage.created_at < cutoff, *[not_(c) for c in claimed])
+
+
+def _row_to_archive(row) -> dict:
+    return {
+        "id": row.id,
+        "session_id": row.session_id,
+        "role": row.role,
+        "content": row.content,
+        "model_used": row.model_used,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# SQLite file stats / incremental vacuum
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+def _sqlite_size(conn) -> int:
+    page_count = conn.execute(text("PRAGMA page_count")).scalar()
+    page_size = conn.execute(text("PRAGMA page_size")).scalar()
+    return page_count * page_size
+
+
+def incremental_vacuum(engine, convert: bool = False) -> dict:
+    """
+    Return freed pages to the filesystem in small chunks.
+
+    Incremental vacuum only works once the file is in auto_vacuum=INCREMENTAL
+    mode. New databases get it from database.py; existing files need a single
+    full VACUUM to switch (`convert=True`), which holds an exclusive lock.
+    """
+    if engine.dialect.name != "sqlite":
+        return {"bytes_reclaimed": 0, "skipped": "not sqlite"}
+
+    # VACUUM cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        size_before = _sqlite_size(conn)
+        mode = conn.execute(text("PRAGMA auto_vacuum")).scalar()
+        if mode != 2:
+            if not convert:
+                return {
+                    "bytes_reclaimed": 0,
+                    "skipped": "auto_vacuum is not INCREMENTAL (run with --convert-vacuum once)",
+                }
+            conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+            conn.execute(text("VACUUM"))
+        else:
+            # pysqlite's execute() steps the pragma only once (one page);
+            # executescript runs it to completion.
+            raw = conn.connection.dbapi_connection
+            while conn.execute(text("PRAGMA freelist_count")).scalar():
+                raw.executescript(f"PRAGMA incremental_vacuum({VACUUM_CHUNK_PAGES});")
+                time.sleep(RETENTION_BATCH_PAUSE)
+        size_after = _sqlite_size(conn)
+
+    return {"bytes_reclaimed": max(size_before - size_after, 0)}
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Retention job
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+def run_retention(
+    policies: list[tuple[str, int]] = RETENTION_POLICIES,
+    default_days: int = RETENTION_DEFAULT_DAYS,
+    archive_dir: Path = RETENTION_ARCHIVE_DIR,
+    batch_size: int = RETENTION_BATCH_SIZE,
+    archive: bool = True,
+    dry_run: bool = False,
+    vacuum: bool = True,
+    convert_vacuum: bool = False,
+) -> dict:
+    """
+    Archive and purge expired chat_messages rows, then compact the file.
+
+    Returns metrics:
+        {
+            "rows_purged": int,
+            "by_policy": {label: rows},
+            "batches": int,
+            "archive_path": str | None,
+            "bytes_reclaimed": int,
+            "duration_s": float,
+        }
+    """
+    started = time.perf_counter()
+    init_db()
+    engine = get_engine()
+    now = datetime.now(timezone.utc)
+    table = ChatMessage.__table__
+
+    metrics = {"rows_purged": 0, "by_policy": {}, "batches": 0, "archive_path": None}
+
+    archive_file = None
+    if archive and not dry_run:
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        path = archive_dir / f"chat_messages-{now.strftime('%Y%m%dT%H%M%SZ')}.jsonl.gz"
+        archive_file = gzip.open(path, "at", encoding="utf-8")
+        metrics["archive_path"] = str(path)
+
+    try:
+        for label, condition in _expiry_conditions(policies, default_days, now):
+            purged = 0
+            if dry_run:
+                with engine.connect() as conn:
+                    purged = conn.execute(
+                        select(func.count()).select_from(table).where(condition)
+                    ).scalar()
+            else:
+                while True:
+                    # One short transaction per batch: read, archive, delete, commit
+                    with engine.begin() as conn:
+                        rows = conn.execute(
+                            select(table)
+                            .where(condition)
+                            .order_by(table.c.session_id, table.c.created_at)
+                            .limit(batch_size)
+                        ).all()
+                        if not rows:
+                            break
+                        if archive_file is not None:
+                            for row in rows:
+                                archive_file.write(json.dumps(_row_to_archive(row), ensure_ascii=False) + "\n")
+                            archive_file.flush()
+                        conn.execute(delete(table).where(table.c.id.in_([row.id for row in rows])))
+                    purged += len(rows)
+                    metrics["batches"] += 1
+                    # Let live requests grab the write lock between batches
+                    time.sleep(RETENTION_BATCH_PAUSE)
+            metrics["by_policy"][label] = purged
+            metrics["rows_purged"] += purged
+    finally:
+        if archive_file is not None:
+            archive_file.close()
+
+    if archive_file is not None and metrics["rows_purged"] == 0:
+        Path(metrics["archive_path"]).unlink(missing_ok=True)
+        metrics["archive_path"] = None
+
+    metrics["bytes_reclaimed"] = 0
+    if vacuum and not dry_run:
+        metrics.update(incremental_vacuum(engine, convert=convert_vacuum))
+
+    metrics["duration_s"] = round(time.perf_counter() - started, 3)
+    print(
+        f"[RETENTION] purged {metrics['rows_purged']} rows in {metrics['batches']} batches, "
+        f"reclaimed {metrics['bytes_reclaimed']} bytes"
+    )
+    if "skipped" in metrics:
+        print(f"[RETENTION] vacuum skipped: {metrics['skipped']}")
+    return metrics
@@ -0,0 +1,39 @@
+"""
+Shared environment loading for the Portfolio API.
+
+`.env` is read exactly once per process, no matter how many modules ask for it.
+
+LAZY_INIT (cold-start mode) defers engine creation and `create_all` to the first
+request that needs the database. It defaults to on under Vercel, where every
+cold start pays for module import before the first byte is served.
+"""
+
+import os
+from pathlib import Path
+
+_env_loaded = False
+
+
+def load_env():
+    """Load `api/.env` into os.environ (first call only)."""
+    global _env_loaded
+    if _env_loaded:
+        return
+    env_file = Path(__file__).parent / ".env"
+    if env_file.exists():
+        from dotenv import load_dotenv
+        load_dotenv(env_file)
+    _env_loaded = True
+
+
+load_env()
+
+LAZY_INIT = os.getenv("LAZY_INIT", "1" if os.getenv("VERCEL") else "0") == "1"
+
+# A serverless function may be frozen as soon as its response is sent, so a
+# reply row queued for after the response could be lost there. Under Vercel
+# the chat turn waits for it instead (giving up the pipelining saving).
+AWAIT_REPLY_WRITES = os.getenv("AWAIT_REPLY_WRITES", "1" if os.getenv("VERCEL") else "0") == "1"
+
+# Shared secret for /api/admin/* endpoints (X-Admin-Token); unset = disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
@@ -0,0 +1,132 @@
+"""
+Benchmark the cost of a rejected (rate-limited) POST /api/chat.
+
+  - before: the limit is a route dependency — routing, JSON body parsing into
+            ChatRequest and the get_db / get_profile dependencies all run first
+  - after:  EdgeFilterMiddleware answers with a pre-rendered 429 before routing
+
+Requests are driven straight through the ASGI interface (no HTTP client or
+socket in the way) with the caller's IP already over its limit, so every
+request is rejected.
+
+Usage (from the repo root):
+    python -m scripts.bench_edge --requests 5000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def _build_legacy_app():
+    """The pre-edge /api/chat: rate limit as a dependency, no edge middleware."""
+    from fastapi import Depends, FastAPI, HTTPException, Request
+    from fastapi.middleware.cors import CORSMiddleware
+    from sqlalchemy.orm import Session
+
+    from api.database import get_db
+    from api.main import ChatRequest, ChatResponse, get_profile
+    from api.profiles import CompiledProfile
+    from api.rate_limiter import check_limits, get_client_ip
+
+    def check_chat_limit(request: Request):
+        rejected = check_limits(get_client_ip(request), "chat")
+        if rejected:
+            print(f"[RATE LIMIT] {get_client_ip(request)} hit {rejected['scope']} limit")
+            raise HTTPException(
+                status_code=429,
+                detail={
+                    "error": "Too many requests. Please slow down.",
+                    "retry_after": rejected["retry_after"],
+                    "limit": rejected["limit"],
+                },
+                headers={"Retry-After": str(int(rejected["retry_after"]))},
+            )
+
+    app = FastAPI()
+    app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+    @app.post("/api/chat", response_model=ChatResponse, dependencies=[Depends(check_chat_limit)])
+    async def chat(
+        request: ChatRequest,
+        db: Session = Depends(get_db),
+        profile: CompiledProfile = Depends(get_profile),
+    ):
+        raise AssertionError("rate limit should have rejected this request")
+
+    return app
+
+
+async def _drive(app, body: bytes, n: int) -> list[float]:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/api/chat", "raw_path": b"/api/chat",
+        "query_string": b"", "root_path": "", "server": ("testserver", 80), "client": ("10.0.0.1", 5000),
+        "headers": [
+            (b"host", b"testserver"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"origin", b"http://localhost:5173"),
+        ],
+    }
+    samples = []
+    for _ in range(n):
+        status = []
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+
+        started = time.perf_counter()
+        await app(dict(scope), receive, send)
+        samples.append((time.perf_counter() - started) * 1e6)
+        assert status == [429], status
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--message-bytes", type=int, default=2000, help="size of the rejected message")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-edge-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+
+    from api.main import app
+    from api.rate_limiter import rate_limiter
+
+    legacy = _build_legacy_app()
+    body = json.dumps({"message": "x" * args.message_bytes, "session_id": "bench"}).encode()
+
+    # Put the caller over its chat limit once; every request after that is rejected
+    while rate_limiter.is_allowed("10.0.0.1", "chat")["allowed"]:
+        pass
+
+    results = {}
+    with contextlib.redirect_stdout(io.StringIO()):  # silence per-request [RATE LIMIT] lines
+        for label, target in (("before", legacy), ("after", app)):
+            asyncio.run(_drive(target, body, 200))  # warm-up
+            samples = sorted(asyncio.run(_drive(target, body, args.requests)))
+            results[label] = (statistics.median(samples), samples[int(len(samples) * 0.99) - 1])
+
+    print(f"{args.requests} rejected requests, {len(body)} B body")
+    print(f"{'path':<7} {'median µs':>10} {'p99 µs':>9}  speedup")
+    for label in ("before", "after"):
+        median, p99 = results[label]
+        print(f"{label:<7} {median:>10.1f} {p99:>9.1f}  {results['before'][0] / median:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Benchmark GET /api/chat/history: legacy Pydantic path vs. the fast path.
+
+Seeds a throwaway SQLite DB with one session of N messages, then times:
+  - legacy: ORM rows → ChatHistoryItem per row → response_model re-validation
+  - fast:   column tuples → dicts → FastJSONResponse (orjson)
+
+Both go through the full FastAPI stack via TestClient.
+
+Usage (from the repo root):
+    python -m scripts.bench_history --sizes 1000 10000 --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-history-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+
+    from fastapi import Depends
+    from fastapi.testclient import TestClient
+    from sqlalchemy.orm import Session
+
+    from api.database import ChatMessage, db_session, get_db, init_db
+    from api.main import ChatHistoryItem, app
+    from api.rate_limiter import RATE_LIMITS
+
+    # The benchmark hammers one endpoint from one IP
+    RATE_LIMITS.clear()
+
+    @app.get("/bench/history-legacy", response_model=list[ChatHistoryItem])
+    def legacy_history(session_id: str, db: Session = Depends(get_db)):
+        messages = (
+            db.query(ChatMessage)
+            .filter(ChatMessage.session_id == session_id)
+            .order_by(ChatMessage.created_at.asc())
+            .all()
+        )
+        return [
+            ChatHistoryItem(
+                role=msg.role,
+                content=msg.content,
+                model_used=msg.model_used,
+                created_at=msg.created_at.isoformat() if msg.created_at else "",
+            )
+            for msg in messages
+        ]
+
+    init_db()
+    base = datetime.now(timezone.utc)
+    with db_session() as db:
+        for size in args.sizes:
+            db.add_all(
+                ChatMessage(
+                    session_id=f"bench-{size}",
+                    role="user" if i % 2 == 0 else "assistant",
+                    content=f"Message {i}: " + "Tell me about Harsh's projects and experience. " * 3,
+                    model_used=None if i % 2 == 0 else "meta-llama/llama-3.3-70b-instruct:free",
+                    created_at=base + timedelta(milliseconds=i),
+                )
+                for i in range(size)
+            )
+        db.commit()
+
+    print(f"{'messages':>9}  {'path':<7} {'median ms':>10} {'p90 ms':>8}  speedup")
+    with TestClient(app) as client:
+        for size in args.sizes:
+            results = {}
+            for label, url in (("legacy", "/bench/history-legacy"), ("fast", "/api/chat/history")):
+                client.get(url, params={"session_id": f"bench-{size}"})  # warm-up
+                samples = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    response = client.get(url, params={"session_id": f"bench-{size}"})
+                    samples.append((time.perf_counter() - started) * 1000)
+                    assert response.status_code == 200 and len(response.json()) == size
+                samples.sort()
+                results[label] = (statistics.median(samples), samples[int(len(samples) * 0.9) - 1])
+
+            for label in ("legacy", "fast"):
+                median, p90 = results[label]
+                speedup = results["legacy"][0] / median
+                print(f"{size:>9}  {label:<7} {median:>10.1f} {p90:>8.1f}  {speedup:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
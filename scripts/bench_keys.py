@@ -0,0 +1,101 @@
+"""
+Benchmark chat_messages primary-key schemes: random uuid4 vs time-ordered uuid7
+(plus an INTEGER rowid key for reference).
+
+Each scheme inserts the same N rows into a fresh SQLite file using the
+chat_messages schema, committing every --batch rows, and reports insert
+throughput, file size and primary-key index size.
+
+Usage (from the repo root):
+    python -m scripts.bench_keys --rows 200000 --batch 100
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+from api.database import uuid7
+
+SCHEMA_TEXT_KEY = """
+CREATE TABLE chat_messages (
+    id VARCHAR NOT NULL PRIMARY KEY,
+    session_id VARCHAR NOT NULL,
+    role VARCHAR NOT NULL,
+    content TEXT NOT NULL,
+    model_used VARCHAR,
+    created_at DATETIME
+);
+CREATE INDEX ix_chat_messages_session_id ON chat_messages (session_id);
+"""
+
+SCHEMA_INT_KEY = SCHEMA_TEXT_KEY.replace("id VARCHAR NOT NULL PRIMARY KEY", "id INTEGER PRIMARY KEY")
+
+SCHEMES = {
+    "uuid4": (SCHEMA_TEXT_KEY, lambda: str(uuid.uuid4())),
+    "uuid7": (SCHEMA_TEXT_KEY, lambda: uuid7()),
+    "int-rowid": (SCHEMA_INT_KEY, lambda: None),
+}
+
+
+def _index_bytes(conn: sqlite3.Connection, name: str) -> int | None:
+    try:
+        return conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (name,)).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None  # SQLite built without DBSTAT_VTAB
+
+
+def run(scheme: str, rows: int, batch: int, directory: str) -> dict:
+    schema, make_id = SCHEMES[scheme]
+    path = os.path.join(directory, f"{scheme}.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(schema)
+
+    content = "Harsh has shipped production apps at Miracle AI and Vaxalor AI. " * 3
+    started = time.perf_counter()
+    for start in range(0, rows, batch):
+        now = datetime.now(timezone.utc).isoformat(" ")
+        conn.executemany(
+            "INSERT INTO chat_messages (id, session_id, role, content, model_used, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (make_id(), f"session-{i % 500}", "assistant", content, "bench", now)
+                for i in range(start, min(start + batch, rows))
+            ],
+        )
+        conn.commit()
+    elapsed = time.perf_counter() - started
+
+    pk_index = "sqlite_autoindex_chat_messages_1" if scheme != "int-rowid" else None
+    result = {
+        "scheme": scheme,
+        "rows_per_s": rows / elapsed,
+        "file_mb": os.path.getsize(path) / 1e6,
+        "pk_index_mb": (_index_bytes(conn, pk_index) or 0) / 1e6 if pk_index else 0.0,
+    }
+    conn.close()
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=100, help="rows per commit")
+    parser.add_argument("--schemes", nargs="+", default=list(SCHEMES), choices=list(SCHEMES))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-keys-") as directory:
+        print(f"{args.rows} rows, commit every {args.batch}")
+        print(f"{'scheme':<10} {'rows/s':>10} {'file MB':>9} {'PK index MB':>12}")
+        for scheme in args.schemes:
+            r = run(scheme, args.rows, args.batch, directory)
+            print(f"{r['scheme']:<10} {r['rows_per_s']:>10.0f} {r['file_mb']:>9.1f} {r['pk_index_mb']:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
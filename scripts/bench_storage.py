@@ -0,0 +1,151 @@
+"""
+Benchmark compact content storage: database size and read latency.
+
+Seeds a throwaway SQLite DB with realistic chat traffic (LLM-style replies
+built from resume sentences, preset/sanitized/error replies, occasional long
+pastes), then measures the same DB as plain TEXT and after training a zstd
+dictionary and converting it with content_store:
+
+  - file size after VACUUM and bytes stored in chat_messages.content
+  - history read (the /api/chat/history query) for random sessions
+  - full scan of every message (export / retention archive pattern)
+
+Usage (from the repo root):
+    python -m scripts.bench_storage --sessions 2000 --turns 10 --repeat 200
+"""
+
+import argparse
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+
+QUESTIONS = [
+    "What projects has Harsh built?",
+    "Tell me about his experience at Miracle AI.",
+    "Which tech stack does he use most?",
+    "hi",
+    "Is he a good fit for a backend role?",
+    "What are his weaknesses?",
+    "Can you explain his AI work in detail?",
+]
+
+
+def _seed(sessions: int, turns: int, rng: random.Random):
+    from sqlalchemy import insert
+
+    from api.database import ChatMessage, get_engine, init_db
+    from api.profiles import profile_registry
+    from api.resume_context import RESUME_SYSTEM_PROMPT
+
+    init_db()
+    profile = profile_registry.get()
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", RESUME_SYSTEM_PROMPT) if len(s.strip()) > 30]
+    canned = [*profile.category_responses.values(), profile.sanitized_response, profile.error_reply]
+    base = datetime.now(timezone.utc) - timedelta(days=30)
+
+    rows = []
+    for s in range(sessions):
+        for t in range(turns):
+            created = base + timedelta(seconds=s * 60 + t * 2)
+            if rng.random() < 0.05:
+                question = " ".join(rng.sample(sentences, 12))  # pasted job description
+            else:
+                question = rng.choice(QUESTIONS)
+            rows.append({"session_id": f"s{s}", "role": "user", "content": question,
+                         "model_used": None, "created_at": created})
+            roll = rng.random()
+            if roll < 0.20:
+                reply, model = rng.choice(canned), "preset:jailbreak"
+            else:
+                reply = " ".join(rng.sample(sentences, rng.randint(2, 5)))
+                model = "meta-llama/llama-3.3-70b-instruct:free"
+            rows.append({"session_id": f"s{s}", "role": "assistant", "content": reply,
+                         "model_used": model, "created_at": created + timedelta(seconds=1)})
+
+    with get_engine().begin() as conn:
+        for start in range(0, len(rows), 5000):
+            conn.execute(insert(ChatMessage.__table__), rows[start:start + 5000])
+    return len(rows)
+
+
+def _measure(path: str, sessions: int, repeat: int, rng: random.Random) -> dict:
+    from sqlalchemy import text
+
+    from api.database import ChatMessage, db_session, get_engine
+    from api.main import _history_rows
+
+    engine = get_engine()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+        content_bytes = conn.execute(
+            text("SELECT SUM(LENGTH(CAST(content AS BLOB))) FROM chat_messages")
+        ).scalar()
+
+    picks = [f"s{rng.randrange(sessions)}" for _ in range(repeat)]
+    history_ms = []
+    with db_session() as db:
+        _history_rows(db, picks[0])  # warm-up
+        for session_id in picks:
+            started = time.perf_counter()
+            _history_rows(db, session_id)
+            history_ms.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        scanned = sum(len(c) for (c,) in db.query(ChatMessage.content).yield_per(5000))
+        scan_s = time.perf_counter() - started
+
+    history_ms.sort()
+    return {
+        "file_mb": os.path.getsize(path) / 1e6,
+        "content_mb": content_bytes / 1e6,
+        "history_median_ms": statistics.median(history_ms),
+        "history_p90_ms": history_ms[int(len(history_ms) * 0.9) - 1],
+        "scan_s": scan_s,
+        "scanned_chars": scanned,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=10, help="user/assistant pairs per session")
+    parser.add_argument("--repeat", type=int, default=200, help="history reads per mode")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench-storage-")
+    path = os.path.join(tmp, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["COMPACT_STORAGE"] = "0"
+
+    from api.content_store import content_store, convert_messages, train_dictionary
+    from api.rate_limiter import RATE_LIMITS
+
+    RATE_LIMITS.clear()
+    rng = random.Random(args.seed)
+    total = _seed(args.sessions, args.turns, rng)
+    plain = _measure(path, args.sessions, args.repeat, random.Random(args.seed))
+
+    trained = train_dictionary()
+    converted = convert_messages(compact=True, pause=0)
+    compact = _measure(path, args.sessions, args.repeat, random.Random(args.seed))
+    assert plain["scanned_chars"] == compact["scanned_chars"], "round-trip mismatch"
+
+    print(f"{total} messages; dictionary {trained['bytes']} B from {trained['samples']} samples; "
+          f"{converted['rows_rewritten']} rows rewritten in {converted['duration_s']}s")
+    print(f"{'mode':<8} {'file MB':>8} {'content MB':>11} {'history ms (p50/p90)':>22} {'full scan s':>12}")
+    for label, r in (("plain", plain), ("compact", compact)):
+        print(f"{label:<8} {r['file_mb']:>8.2f} {r['content_mb']:>11.2f} "
+              f"{r['history_median_ms']:>13.3f}/{r['history_p90_ms']:<8.3f} {r['scan_s']:>12.3f}")
+    print(f"stats: {content_store.get_stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
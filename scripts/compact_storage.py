@@ -0,0 +1,44 @@
+"""
+Manage compact storage of chat_messages.content (see api/content_store.py).
+
+Usage (from the repo root):
+    python -m scripts.compact_storage --train               # train a zstd dictionary on recent messages
+    python -m scripts.compact_storage --convert             # encode existing plain rows, in small batches
+    python -m scripts.compact_storage --convert --recompress   # ...also re-encode rows with older dictionaries
+    python -m scripts.compact_storage --expand              # back to plain TEXT everywhere
+"""
+
+import argparse
+import json
+import sys
+
+from api import profiles  # noqa: F401 — registers the shared preset texts
+from api.content_store import CONVERT_BATCH_SIZE, convert_messages, train_dictionary
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--train", action="store_true", help="train and activate a new dictionary")
+    parser.add_argument("--convert", action="store_true", help="encode plain rows")
+    parser.add_argument("--recompress", action="store_true", help="with --convert: re-encode BLOB rows too")
+    parser.add_argument("--expand", action="store_true", help="decode every row back to plain TEXT")
+    parser.add_argument("--batch-size", type=int, default=CONVERT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.convert and args.expand:
+        parser.error("--convert and --expand are mutually exclusive")
+    if not (args.train or args.convert or args.expand):
+        parser.error("nothing to do: pass --train, --convert and/or --expand")
+
+    if args.train:
+        print(json.dumps(train_dictionary(), indent=2))
+    if args.convert or args.expand:
+        result = convert_messages(
+            compact=args.convert, recompress=args.recompress, batch_size=args.batch_size,
+        )
+        print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
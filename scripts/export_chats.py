@@ -0,0 +1,44 @@
+"""
+Export chat_messages as NDJSON (optionally gzip) with constant memory.
+
+Usage (from the repo root):
+    python -m scripts.export_chats > chats.ndjson
+    python -m scripts.export_chats --start 2026-01-01 --category ATTACK_NEGATIVE
+    python -m scripts.export_chats --model-used "preset:*" --gzip -o presets.ndjson.gz
+"""
+
+import argparse
+import sys
+
+from api.export import iter_messages, iter_ndjson, parse_timestamp
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--start", help="created_at >= this ISO timestamp")
+    parser.add_argument("--end", help="created_at < this ISO timestamp")
+    parser.add_argument("--category", help="Layer 3 category (user messages only)")
+    parser.add_argument("--model-used", help="model_used pattern, '*' wildcard")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args()
+
+    rows = iter_messages(
+        start=parse_timestamp(args.start),
+        end=parse_timestamp(args.end),
+        category=args.category,
+        model_used=args.model_used,
+    )
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in iter_ndjson(rows, compress=args.gzip):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Cold-start import-time report for the Vercel entry point.
+
+Runs `python -X importtime -c "import api.main"` in a fresh interpreter,
+summarizes the slowest top-level imports, and exits non-zero when the total
+cumulative import time exceeds the budget — wire it into CI as the
+cold-start regression check.
+
+Usage (from the repo root):
+    python -m scripts.importtime_report
+    python -m scripts.importtime_report --budget-ms 800 --top 15 --runs 5
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# import time:  self [us] | cumulative | imported package
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S.*)$")
+
+DEFAULT_BUDGET_MS = 1500
+
+
+def measure(module: str = "api.main") -> list[tuple[str, int, int, int]]:
+    """Return (name, self_us, cumulative_us, depth) for every import in a cold interpreter."""
+    env = dict(os.environ, LAZY_INIT="1", PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cum_us, indent, name = match.groups()
+            rows.append((name.strip(), int(self_us), int(cum_us), len(indent) // 2))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--module", default="api.main")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=3, help="report the best of N runs")
+    args = parser.parse_args()
+
+    best_rows, best_total = None, None
+    for _ in range(args.runs):
+        rows = measure(args.module)
+        # Top-level imports (depth 0) sum to the full import cost
+        total = sum(cum for _, _, cum, depth in rows if depth == 0)
+        if best_total is None or total < best_total:
+            best_rows, best_total = rows, total
+
+    top_level = sorted(
+        (r for r in best_rows if r[3] == 0), key=lambda r: r[2], reverse=True
+    )
+    print(f"Cold import of {args.module}: {best_total / 1000:.1f} ms (best of {args.runs})")
+    print(f"{'cumulative ms':>14}  {'self ms':>8}  module")
+    for name, self_us, cum_us, _ in top_level[: args.top]:
+        print(f"{cum_us / 1000:>14.1f}  {self_us / 1000:>8.1f}  {name}")
+
+    own = [r for r in best_rows if r[0] == "api" or r[0].startswith("api.")]
+    if own:
+        print("\nProject modules:")
+        for name, self_us, cum_us, _ in sorted(own, key=lambda r: r[2], reverse=True):
+            print(f"{cum_us / 1000:>14.1f}  {self_us / 1000:>8.1f}  {name}")
+
+    if best_total / 1000 > args.budget_ms:
+        print(f"\n[FAIL] Import time {best_total / 1000:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+        return 1
+    print(f"\n[OK] Within budget ({args.budget_ms:.0f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
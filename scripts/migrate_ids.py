@@ -0,0 +1,34 @@
+"""
+Rewrite legacy uuid4 chat_messages IDs to time-ordered uuid7, online.
+
+Usage (from the repo root):
+    python -m scripts.migrate_ids --check          # count rows still on uuid4
+    python -m scripts.migrate_ids                  # migrate in small batches
+    python -m scripts.migrate_ids --vacuum         # ...then rebuild the file
+"""
+
+import argparse
+import json
+import sys
+
+from api.key_migration import MIGRATION_BATCH_SIZE, count_legacy_ids, migrate_to_uuid7
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--check", action="store_true", help="only count legacy IDs")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument("--vacuum", action="store_true",
+                        help="full VACUUM afterwards (exclusive lock; run off-peak)")
+    args = parser.parse_args()
+
+    if args.check:
+        print(json.dumps({"legacy_ids": count_legacy_ids()}))
+        return 0
+
+    print(json.dumps(migrate_to_uuid7(batch_size=args.batch_size, vacuum=args.vacuum), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Minimal OpenAI-compatible chat-completions server for testing the local provider.
+
+Answers every POST with a canned reply after --delay seconds; --fail-rate
+makes a fraction of requests return 503 so provider fallback can be exercised.
+
+Usage (from the repo root):
+    python -m scripts.mock_llm_server --port 8081 --delay 0.2
+    LOCAL_LLM_URL=http://127.0.0.1:8081/v1/chat/completions LOCAL_LLM_MODELS=mock uvicorn api.main:app
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(reply: str, delay: float, fail_rate: float):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            try:
+                request = json.loads(body or b"{}")
+            except ValueError:
+                request = {}
+            time.sleep(delay)
+
+            if random.random() < fail_rate:
+                self._send(503, {"error": {"message": "mock overloaded"}})
+                return
+
+            tokens = len(reply) // 4
+            self._send(200, {
+                "id": f"mock-{time.time_ns()}",
+                "object": "chat.completion",
+                "model": request.get("model", "mock"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": tokens, "total_tokens": tokens},
+            })
+
+        def _send(self, status: int, payload: dict):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before each reply")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument(
+        "--reply",
+        default="Harsh is a full-stack developer who has shipped production AI apps.",
+    )
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.reply, args.delay, args.fail_rate))
+    print(f"Mock LLM listening on http://{args.host}:{args.port}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
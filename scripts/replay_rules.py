@@ -0,0 +1,71 @@
+"""
+Replay chat.db through Layer 3 / Layer 2 under two rule versions and diff.
+
+Usage (from the repo root):
+    python -m scripts.replay_rules                                 # committed rules vs working tree
+    python -m scripts.replay_rules --baseline git:HEAD~3 --candidate current
+    python -m scripts.replay_rules --candidate api/profiles/jane.json --json > diff.json
+"""
+
+import argparse
+import json
+import sys
+
+from api.replay import REPLAY_PAGE_SIZE, replay
+
+
+def _print_report(report: dict):
+    print(f"{report['baseline']} -> {report['candidate']}: {report['messages']} messages "
+          f"in {report['duration_s']}s ({report['messages_per_s']} msg/s, {report['workers']} workers)")
+    print(f"  user messages classified: {report['user_messages']}, "
+          f"replies validated: {report['replies_validated']} (skipped {report['replies_skipped']})")
+
+    print("\nCategories (baseline / candidate):")
+    baseline, candidate = report["categories"]["baseline"], report["categories"]["candidate"]
+    for category in sorted(set(baseline) | set(candidate)):
+        print(f"  {category:<20} {baseline.get(category, 0):>10} {candidate.get(category, 0):>10}")
+
+    print("\nCategory changes:")
+    for change, count in report["category_changes"].items() or [("none", 0)]:
+        examples = ", ".join(report["examples"].get(change, []))
+        print(f"  {change:<40} {count:>8}  {examples}")
+
+    sanitization = report["sanitization"]
+    print(f"\nSanitized replies: {sanitization['baseline_flagged']} -> {sanitization['candidate_flagged']}")
+    for change in ("newly sanitized", "no longer sanitized"):
+        if change in sanitization:
+            examples = ", ".join(report["examples"].get(change, []))
+            print(f"  {change:<40} {sanitization[change]:>8}  {examples}")
+    for issue, count in report["new_issues"].items():
+        print(f"  new issue {issue:<50} {count:>8}")
+
+    for name, entries in report["warnings"].items():
+        print(f"\nWarnings ({name} = {report[name]}):")
+        for entry in entries:
+            print(f"  {entry}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--baseline", default="git:HEAD",
+                        help="current | git:<rev> | rules .py | profile .json (default: git:HEAD)")
+    parser.add_argument("--candidate", default="current", help="same forms as --baseline (default: current)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--page-size", type=int, default=REPLAY_PAGE_SIZE)
+    parser.add_argument("--limit", type=int, help="replay at most this many messages")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args()
+
+    report = replay(
+        baseline=args.baseline, candidate=args.candidate,
+        workers=args.workers, page_size=args.page_size, limit=args.limit,
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
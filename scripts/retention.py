@@ -0,0 +1,62 @@
+"""
+Run the chat_messages retention job (archive → batched delete → incremental vacuum).
+
+Usage (from the repo root):
+    python -m scripts.retention --dry-run
+    python -m scripts.retention --policy "preset:*=3" --policy "*|sanitized=14" --default-days 60
+    python -m scripts.retention --convert-vacuum   # once, for files created before auto_vacuum
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from api.retention import (
+    RETENTION_ARCHIVE_DIR,
+    RETENTION_BATCH_SIZE,
+    RETENTION_DEFAULT_DAYS,
+    RETENTION_POLICIES,
+    run_retention,
+)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--policy", action="append", metavar="PATTERN=DAYS",
+        help="TTL for model_used matching PATTERN ('*' wildcard, 'none' = NULL); repeatable",
+    )
+    parser.add_argument("--default-days", type=int, default=RETENTION_DEFAULT_DAYS)
+    parser.add_argument("--archive-dir", type=Path, default=RETENTION_ARCHIVE_DIR)
+    parser.add_argument("--batch-size", type=int, default=RETENTION_BATCH_SIZE)
+    parser.add_argument("--no-archive", action="store_true", help="delete without archiving")
+    parser.add_argument("--no-vacuum", action="store_true")
+    parser.add_argument("--convert-vacuum", action="store_true",
+                        help="switch an existing SQLite file to auto_vacuum=INCREMENTAL (full VACUUM)")
+    parser.add_argument("--dry-run", action="store_true", help="only count expired rows")
+    args = parser.parse_args()
+
+    policies = RETENTION_POLICIES
+    if args.policy:
+        policies = []
+        for item in args.policy:
+            pattern, days = item.rsplit("=", 1)
+            policies.append((pattern, int(days)))
+
+    metrics = run_retention(
+        policies=policies,
+        default_days=args.default_days,
+        archive_dir=args.archive_dir,
+        batch_size=args.batch_size,
+        archive=not args.no_archive,
+        dry_run=args.dry_run,
+        vacuum=not args.no_vacuum,
+        convert_vacuum=args.convert_vacuum,
+    )
+    print(json.dumps(metrics, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,9 @@ import { cn } from "@/lib/utils";
 interface Message {
     role: 'user' | 'assistant';
     content: string;
+    // Set on messages sent from this tab; reused on every resend so the backend de-duplicates them
+    clientMessageId?: string;
+    failed?: boolean;
 }
 
 const INITIAL_MESSAGES: Message[] = [
@@ -19,6 +22,42 @@ const INITIAL_MESSAGES: Message[] = [
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || '';
 
+// Network errors and 5xx are retried automatically, with the same client_message_id
+const SEND_ATTEMPTS = 3;
+const RETRY_DELAY_MS = 1000;
+
+async function postChatMessage(message: string, sessionId: string, clientMessageId: string) {
+    let lastError: unknown;
+    for (let attempt = 0; attempt < SEND_ATTEMPTS; attempt++) {
+        if (attempt > 0) {
+            await new Promise(resolve => setTimeout(resolve, RETRY_DELAY_MS * attempt));
+        }
+        let response: Response;
+        try {
+            response = await fetch(`${API_BASE_URL}/api/chat`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    message,
+                    session_id: sessionId,
+                    client_message_id: clientMessageId,
+                }),
+            });
+        } catch (error) {
+            lastError = error;
+            continue;
+        }
+        if (response.ok) {
+            return response.json();
+        }
+        const errorText = await response.text();
+        console.error('Backend error:', errorText);
+        lastError = new Error(`API error: ${response.status}`);
+        if (response.status < 500) break; // a resend would get the same answer
+    }
+    throw lastError;
+}
+
 // Generate or retrieve a persistent session ID
 function getSessionId(): string {
     let sessionId = localStorage.getItem('chat_session_id');
@@ -37,6 +76,8 @@ const ChatBot = () => {
     const [sessionId] = useState(getSessionId);
     const [historyLoaded, setHistoryLoaded] = useState(false);
     const scrollRef = useRef<HTMLDivElement>(null);
+    // Guards against a double submit landing before isTyping re-renders
+    const sendingRef = useRef(false);
 
     // Load chat history when the window opens for the first time
     useEffect(() => {
@@ -71,46 +112,39 @@ const ChatBot = () => {
         }
     };
 
-    const handleSend = async () => {
-        if (!input.trim() || isTyping) return;
-
-        const userMessage = input.trim();
-        setInput('');
-        setMessages(prev => [...prev, { role: 'user', content: userMessage }]);
+    const deliver = async (userMessage: string, clientMessageId: string) => {
+        sendingRef.current = true;
         setIsTyping(true);
+        setMessages(prev => prev.map(m => m.clientMessageId === clientMessageId ? { ...m, failed: false } : m));
 
         try {
-            const response = await fetch(`${API_BASE_URL}/api/chat`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    message: userMessage,
-                    session_id: sessionId,
-                }),
-            });
-
-            if (!response.ok) {
-                const errorText = await response.text();
-                console.error('Backend error:', errorText);
-                throw new Error(`API error: ${response.status}`);
-            }
-
-            const data = await response.json();
+            const data = await postChatMessage(userMessage, sessionId, clientMessageId);
             setMessages(prev => [...prev, { role: 'assistant', content: data.reply }]);
         } catch (error: any) {
             console.error('Chat API error:', error);
-            setMessages(prev => [
-                ...prev,
-                {
-                    role: 'assistant',
-                    content: "Oops, I'm having trouble connecting to the server. Please try again or reach out to Harsh at harshme08@gmail.com!",
-                },
-            ]);
+            setMessages(prev => prev.map(m => m.clientMessageId === clientMessageId ? { ...m, failed: true } : m));
         } finally {
+            sendingRef.current = false;
             setIsTyping(false);
         }
     };
 
+    const handleSend = async () => {
+        if (!input.trim() || isTyping || sendingRef.current) return;
+
+        const userMessage = input.trim();
+        // One ID per user message, created once and kept with it for resends
+        const clientMessageId = crypto.randomUUID();
+        setInput('');
+        setMessages(prev => [...prev, { role: 'user', content: userMessage, clientMessageId }]);
+        await deliver(userMessage, clientMessageId);
+    };
+
+    const handleResend = async (msg: Message) => {
+        if (!msg.clientMessageId || isTyping || sendingRef.current) return;
+        await deliver(msg.content, msg.clientMessageId);
+    };
+
     return (
         <div className="fixed bottom-6 right-6 z-[100] flex flex-col items-end">
             {/* Chat Window */}
@@ -148,6 +182,16 @@ const ChatBot = () => {
                                     )}>
                                         {msg.content}
                                     </div>
+                                    {msg.failed && (
+                                        <button
+                                            type="button"
+                                            onClick={() => handleResend(msg)}
+                                            disabled={isTyping}
+                                            className="mt-1 text-[10px] text-destructive hover:underline disabled:opacity-50"
+                                        >
+                                            {"Couldn't reach the server · Retry (or email harshme08@gmail.com)"}
+                                        </button>
+                                    )}
                                 </div>
                             ))}
                             {isTyping && (